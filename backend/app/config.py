@@ -10,5 +10,45 @@ class Settings(BaseSettings):
     minio_access_key: str = os.getenv("MINIO_ACCESS_KEY")
     minio_secret_key: str = os.getenv("MINIO_SECRET_KEY")
     minio_bucket: str = os.getenv("MINIO_BUCKET", "sign-dataset")
+    # /upload/camera worker pool: threads, max queued+running jobs before 503, Retry-After seconds
+    camera_workers: int = int(os.getenv("CAMERA_WORKERS", "4"))
+    camera_max_pending: int = int(os.getenv("CAMERA_MAX_PENDING", "32"))
+    camera_retry_after: int = int(os.getenv("CAMERA_RETRY_AFTER", "2"))
+    # decoded frames buffered between the video decoder thread and MediaPipe
+    ingest_prefetch_frames: int = int(os.getenv("INGEST_PREFETCH_FRAMES", "4"))
+    # downscale decoded frames so the longer side is at most this many pixels before MediaPipe (0 = off).
+    # Off until landmark drift vs full resolution is measured on real clips (scripts/bench_downscale.py)
+    ingest_max_side: int = int(os.getenv("INGEST_MAX_SIDE", "0"))
+    # MediaPipe Hands: pre-warmed instances per worker process + model settings
+    hands_pool_size: int = int(os.getenv("HANDS_POOL_SIZE", "1"))
+    hands_model_complexity: int = int(os.getenv("HANDS_MODEL_COMPLEXITY", "1"))
+    hands_min_detection_confidence: float = float(os.getenv("HANDS_MIN_DETECTION_CONFIDENCE", "0.5"))
+    hands_min_tracking_confidence: float = float(os.getenv("HANDS_MIN_TRACKING_CONFIDENCE", "0.5"))
+    # long videos: split into up to N segments extracted by parallel Celery subtasks
+    # (only when each segment would cover at least segment_min_seconds; 1 = off)
+    segment_parallelism: int = int(os.getenv("SEGMENT_PARALLELISM", "1"))
+    segment_min_seconds: float = float(os.getenv("SEGMENT_MIN_SECONDS", "30"))
+    segment_warmup_frames: int = int(os.getenv("SEGMENT_WARMUP_FRAMES", "3"))
+    # multi-sign recordings: activity.detect_sign_segments thresholds (in sampled frames)
+    sign_min_frames: int = int(os.getenv("SIGN_MIN_FRAMES", "4"))
+    sign_max_gap: int = int(os.getenv("SIGN_MAX_GAP", "3"))
+    sign_energy_ratio: float = float(os.getenv("SIGN_ENERGY_RATIO", "0.1"))
+    # raw keypoint cache (see processing/kp_cache.py): directory + LRU size cap in bytes (0 = off)
+    kp_cache_dir: str = os.getenv("KP_CACHE_DIR", os.path.join("dataset", "cache", "keypoints"))
+    kp_cache_max_bytes: int = int(os.getenv("KP_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+    # augmentation: recipe name (augmenter.RECIPES or augment_recipes_file), and whether samples
+    # store only the base sequence + recipe/seed (lazy, expanded on export) or every variant on disk.
+    # Lazy is opt-in: samples.csv and /dataset counts then see one file per recording.
+    augment_recipe: str = os.getenv("AUGMENT_RECIPE", "default")
+    augment_recipes_file: str = os.getenv("AUGMENT_RECIPES_FILE", "")
+    augment_lazy: bool = os.getenv("AUGMENT_LAZY", "0").lower() not in ("0", "false", "no")
+    # threads decompressing .npz samples during export/validation (0 = one per CPU)
+    export_workers: int = int(os.getenv("EXPORT_WORKERS", "0"))
+    # rows per shard for the sharded export (processing/shards.py)
+    export_shard_size: int = int(os.getenv("EXPORT_SHARD_SIZE", "10000"))
+    # largest declared size accepted by /upload/video/resumable (bytes)
+    resumable_max_size: int = int(os.getenv("RESUMABLE_MAX_SIZE", str(8 * 1024 ** 3)))
+    # resumable uploads idle this long (no part received) are removed by the sweep (seconds)
+    resumable_max_age: int = int(os.getenv("RESUMABLE_MAX_AGE", str(24 * 3600)))
 
 settings = Settings()
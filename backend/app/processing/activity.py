@@ -0,0 +1,95 @@
+"""
+Sign activity detection on extracted keypoints
+- Hand presence per frame (non-zero hand block, see keypoints_adapter)
+- Motion energy: smoothed frame-to-frame landmark displacement
+- Active runs -> (start, end) sign instances, so one multi-sign recording
+  can be saved as several samples after a single decode/extraction pass
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+# per-hand block size in the (T, 126) layout
+HAND_D = 63
+
+
+def hand_presence(seq: np.ndarray) -> np.ndarray:
+    """(T,) bool: at least one hand detected."""
+    if seq.shape[1] < 2 * HAND_D:
+        return np.any(seq != 0, axis=1)
+    left = np.any(seq[:, :HAND_D] != 0, axis=1)
+    right = np.any(seq[:, HAND_D:2 * HAND_D] != 0, axis=1)
+    return left | right
+
+
+def motion_energy(seq: np.ndarray, present: np.ndarray = None, window: int = 3) -> np.ndarray:
+    """
+    (T,) mean absolute landmark displacement to the previous frame, moving-average smoothed.
+    Frames where a hand appears/disappears count as zero (the jump is not motion).
+    """
+    T = seq.shape[0]
+    if present is None:
+        present = hand_presence(seq)
+    energy = np.zeros(T, dtype=np.float32)
+    if T < 2:
+        return energy
+    diff = np.abs(np.diff(seq, axis=0))
+    # only compare coordinates that are non-zero in both frames
+    both = (seq[1:] != 0) & (seq[:-1] != 0)
+    counts = both.sum(axis=1)
+    moved = np.where(counts > 0, (diff * both).sum(axis=1) / np.maximum(counts, 1), 0.0)
+    energy[1:] = np.where(present[1:] & present[:-1], moved, 0.0)
+    if window > 1:
+        energy = np.convolve(energy, np.ones(window, dtype=np.float32) / window, mode="same").astype(np.float32)
+    return energy
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """[start, end) runs of True."""
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+
+def detect_sign_segments(seq: np.ndarray, min_frames: int = None, max_gap: int = None,
+                         energy_ratio: float = None, pad: int = 1) -> List[Tuple[int, int]]:
+    """
+    Split a (T, 126) keypoint sequence into sign instances.
+
+    A frame is active when a hand is present and its motion energy is above
+    energy_ratio * (90th percentile of energy over hand frames). Active runs closer
+    than max_gap frames are merged, runs shorter than min_frames dropped, and each
+    run is widened by `pad` frames. Returns [(start, end), ...] in order.
+    """
+    min_frames = settings.sign_min_frames if min_frames is None else min_frames
+    max_gap = settings.sign_max_gap if max_gap is None else max_gap
+    energy_ratio = settings.sign_energy_ratio if energy_ratio is None else energy_ratio
+
+    T = seq.shape[0]
+    if T == 0:
+        return []
+    present = hand_presence(seq)
+    if not present.any():
+        return []
+    energy = motion_energy(seq, present)
+    ref = float(np.percentile(energy[present], 90))
+    active = present & (energy >= energy_ratio * ref) if ref > 0 else present.copy()
+
+    # close short gaps (holds / brief tracking drop-outs inside one sign)
+    runs = _runs(active)
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    segments = []
+    for start, end in merged:
+        if end - start < min_frames:
+            continue
+        segments.append((max(0, start - pad), min(T, end + pad)))
+    return segments
@@ -2,12 +2,20 @@
 Refactored augmentation functions
 - Stage A: Frame-level augmentation (flip, brightness, noise)
 - Stage B: Keypoint-level augmentation (scaling, jitter, time-warp)
+- Batched Stage B engine: all variants of one or many sequences as a (K, T, D) /
+  (B, K, T, D) float32 array, noise drawn in a single Generator call
 """
 
+import hashlib
+import json
+import os
+
 import numpy as np
 import cv2
 import random
 
+from app.config import settings
+
 # -------- Stage A: Frame-level augment --------
 def flip_frames(frames):
     return [cv2.flip(f, 1) for f in frames]
@@ -40,12 +48,70 @@ def jitter_sequence(seq: np.ndarray, sigma=0.01):
     noise = np.random.normal(0, sigma, seq.shape)
     return seq + noise
 
-def time_warp(seq: np.ndarray, factor=1.2):
-    """simple temporal stretch/compress"""
-    T, D = seq.shape
-    new_T = int(T * factor)
-    idx = np.linspace(0, T - 1, new_T).astype(np.int32)
-    return seq[idx]
+def warp_positions(T: int, factor: float, target_T: int = None) -> np.ndarray:
+    """
+    Source frame positions for a uniform speed change: output frame t reads source t / factor.
+    factor > 1 stretches (slower, the end falls outside the window), factor < 1 compresses
+    (faster, frames after the sequence ends are padding).
+    """
+    target_T = T if target_T is None else target_T
+    return np.arange(target_T, dtype=np.float64) / float(factor)
+
+def random_warp_positions(T: int, rng: np.random.Generator = None, strength: float = 0.2,
+                          knots: int = 4, size: int = None) -> np.ndarray:
+    """
+    Random monotone warp(s) of [0, T-1] onto itself, first and last frame fixed.
+    The local speed of each of `knots` pieces is drawn from [1 - strength, 1 + strength].
+    Returns (T,) positions, or (size, T) for one warp per sequence.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    n = 1 if size is None else size
+    speed = rng.uniform(1.0 - strength, 1.0 + strength, size=(n, knots))
+    cum = np.concatenate([np.zeros((n, 1)), np.cumsum(speed, axis=1)], axis=1)
+    cum *= (T - 1) / cum[:, -1:]
+    grid = np.linspace(0, T - 1, knots + 1)
+    t = np.arange(T, dtype=np.float64)
+    # piecewise-linear between knots (monotone because every speed is > 0)
+    seg = np.minimum((t * knots / max(T - 1, 1)).astype(np.intp), knots - 1)
+    frac = (t - grid[seg]) / (grid[1] - grid[0]) if T > 1 else np.zeros(T)
+    pos = cum[:, seg] + (cum[:, seg + 1] - cum[:, seg]) * frac
+    return pos[0] if size is None else pos
+
+def resample(seqs: np.ndarray, positions: np.ndarray, fill: float = 0.0) -> np.ndarray:
+    """
+    Linear interpolation of (..., T, D) sequences at fractional frame positions, all D at once.
+    positions: (T_out,) shared by every sequence, or (B, T_out) one row per sequence of a (B, T, D) batch.
+    Positions outside [0, T-1] give `fill`. Returns (..., T_out, D) float32.
+    """
+    seqs = np.asarray(seqs, dtype=np.float32)
+    pos = np.asarray(positions, dtype=np.float64)
+    T = seqs.shape[-2]
+    inside = (pos >= 0) & (pos <= T - 1 + 1e-9)
+    p = np.clip(pos, 0, T - 1)
+    i0 = np.floor(p).astype(np.intp)
+    i1 = np.minimum(i0 + 1, T - 1)
+    w = (p - i0).astype(np.float32)[..., None]
+    if pos.ndim == 1:
+        a, b = seqs[..., i0, :], seqs[..., i1, :]
+    else:
+        a = np.take_along_axis(seqs, i0[..., None], axis=-2)
+        b = np.take_along_axis(seqs, i1[..., None], axis=-2)
+    out = a + (b - a) * w
+    if not inside.all():
+        out = np.where(inside[..., None], out, np.float32(fill))
+    return out
+
+def time_warp(seq: np.ndarray, factor=1.2, target_T: int = None):
+    """Temporal stretch/compress of (T, D) or (B, T, D), resampled to a fixed length (default T)."""
+    seq = np.asarray(seq, dtype=np.float32)
+    return resample(seq, warp_positions(seq.shape[-2], factor, target_T))
+
+def random_time_warp(seqs: np.ndarray, rng: np.random.Generator = None, strength: float = 0.2, knots: int = 4):
+    """Non-uniform monotone time warp; a (B, T, D) batch gets an independent warp per sequence."""
+    seqs = np.asarray(seqs, dtype=np.float32)
+    T = seqs.shape[-2]
+    size = seqs.shape[0] if seqs.ndim == 3 else None
+    return resample(seqs, random_warp_positions(T, rng, strength, knots, size))
 
 def stage_b_keypoint_level(seq: np.ndarray):
     return {
@@ -59,7 +125,153 @@ def stage_b_keypoint_level(seq: np.ndarray):
         "combined": jitter_sequence(scale_sequence(seq, 1.05), 0.015)
     }
 
+# -------- Batched Stage B engine --------
+# Same variants, in the same order, as stage_b_keypoint_level:
+# (name, scale factor, jitter sigma, time-warp factor)
+VARIANTS = (
+    ("original", 1.0, 0.0, 1.0),
+    ("scaled_up", 1.1, 0.0, 1.0),
+    ("scaled_down", 0.9, 0.0, 1.0),
+    ("jittered_light", 1.0, 0.01, 1.0),
+    ("jittered_heavy", 1.0, 0.03, 1.0),
+    ("timewarp_fast", 1.0, 0.0, 1.3),
+    ("timewarp_slow", 1.0, 0.0, 0.8),
+    ("combined", 1.05, 0.015, 1.0),
+)
+VARIANT_NAMES = tuple(v[0] for v in VARIANTS)
+
+
+def augment_batch(seqs: np.ndarray, rng: np.random.Generator = None, seed: int = None,
+                  variants=VARIANTS) -> np.ndarray:
+    """
+    All keypoint-level variants in one vectorized pass.
+    seqs: (T, D) -> returns (K, T, D); (B, T, D) -> returns (B, K, T, D). float32, K = len(variants).
+    rng / seed: noise source (a fresh seeded Generator when rng is None); all jitter
+    noise for the batch comes from one standard_normal call, scaled per variant.
+    Time-warped variants are resampled with linear interpolation to the input length
+    (time_warp), so every variant has T frames. The warp is applied first, then the
+    variant's scale and jitter, so a variant can combine all three.
+    """
+    seqs = np.asarray(seqs, dtype=np.float32)
+    single = seqs.ndim == 2
+    if single:
+        seqs = seqs[None]
+    if seqs.ndim != 3:
+        raise ValueError(f"expected (T, D) or (B, T, D), got shape {seqs.shape}")
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    B, T, D = seqs.shape
+
+    scales = np.array([v[1] for v in variants], dtype=np.float32)
+    sigmas = np.array([v[2] for v in variants], dtype=np.float32)
+    jittered = np.flatnonzero(sigmas > 0)
+
+    out = np.repeat(seqs[:, None], len(variants), axis=1)
+    for k, v in enumerate(variants):
+        if v[3] != 1.0:
+            out[:, k] = resample(seqs, warp_positions(T, v[3]))
+    out *= scales[None, :, None, None]
+    noise = rng.standard_normal((B, len(jittered), T, D), dtype=np.float32)
+    noise *= sigmas[jittered][None, :, None, None]
+    out[:, jittered] += noise
+    return out[0] if single else out
+
+# -------- Recipes --------
+# A recipe is a named list of variants. Samples store only the base sequence plus
+# {aug_recipe, aug_seed} in their sidecar; readers rebuild the variants with
+# materialize(), so the policy can change without re-ingesting.
+# Extra recipes: JSON file at settings.augment_recipes_file,
+#   {"name": [["variant", scale, sigma, warp], ...], ...}
+RECIPES = {
+    "default": VARIANTS,
+    "none": VARIANTS[:1],
+}
+
+
+# parsed recipes, reused until the recipes file's (path, mtime, size) changes
+_recipes_cache = (None, None)
+
+
+def _recipes_file_stamp():
+    path = settings.augment_recipes_file
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _load_recipes() -> dict:
+    global _recipes_cache
+    stamp = _recipes_file_stamp()
+    cached_stamp, recipes = _recipes_cache
+    if recipes is not None and cached_stamp == stamp:
+        return recipes
+    recipes = dict(RECIPES)
+    if stamp is not None:
+        with open(stamp[0], encoding="utf-8") as f:
+            for name, variants in json.load(f).items():
+                recipes[name] = tuple((str(n), float(sc), float(sg), float(w)) for n, sc, sg, w in variants)
+    _recipes_cache = (stamp, recipes)
+    return recipes
+
+
+def reload_recipes() -> dict:
+    """Drop the parsed recipes so the next lookup re-reads augment_recipes_file."""
+    global _recipes_cache
+    _recipes_cache = (None, None)
+    return get_recipes()
+
+
+def get_recipes() -> dict:
+    """Built-in recipes plus augment_recipes_file; the file is parsed again only when it changes."""
+    return dict(_load_recipes())
+
+
+def recipes_fingerprint() -> str:
+    """Hash of every recipe definition; exports of lazy samples are stale when it changes."""
+    recipes = _load_recipes()
+    blob = json.dumps(sorted((name, list(map(list, variants))) for name, variants in recipes.items()))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def get_recipe(name: str = None):
+    """Variants of a recipe (settings.augment_recipe when name is None). Raises KeyError."""
+    name = name or settings.augment_recipe
+    recipes = _load_recipes()
+    if name not in recipes:
+        raise KeyError(f"unknown augmentation recipe: {name}")
+    return recipes[name]
+
+
+def new_seed() -> int:
+    return int(np.random.default_rng().integers(0, 2 ** 31 - 1))
+
+
+def materialize(seq: np.ndarray, recipe: str = None, seed: int = None) -> np.ndarray:
+    """(T, D) base sequence -> (K, T, D) float32 variants, deterministic for a given (recipe, seed)."""
+    return augment_batch(seq, seed=seed, variants=get_recipe(recipe))
+
+
+def expand_sample(seq: np.ndarray, meta: dict):
+    """
+    Yield (sequence, meta) for every variant a stored sample stands for.
+    Lazy samples (meta has aug_recipe) are materialized; others are yielded as-is.
+    """
+    recipe = meta.get("aug_recipe")
+    if not recipe:
+        yield seq, meta
+        return
+    variants = materialize(seq, recipe, meta.get("aug_seed"))
+    for k, variant in enumerate(variants):
+        yield variant, {**meta, "aug_index": k, "total_augs": len(variants)}
+
 # -------- Wrapper --------
-def generate_augmented_sequences(sequence_array, config=None):
-    # combine Stage B augmentations
-    return list(stage_b_keypoint_level(sequence_array).values())
+def generate_augmented_sequences(sequence_array, config=None, rng=None):
+    """
+    Materialize Stage B variants (batched engine, float32, fixed length).
+    config: {"recipe": name} picks a recipe, default settings.augment_recipe.
+    """
+    variants = get_recipe((config or {}).get("recipe"))
+    return list(augment_batch(sequence_array, rng=rng, variants=variants))
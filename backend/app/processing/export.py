@@ -0,0 +1,471 @@
+"""
+Streaming memmap export
+- Pass 1 (scan): read only the .npy header inside each .npz (zipfile, no decompression
+  of the array) plus the JSON sidecar -> N, T, D and the row layout
+- Pass 2 (write): decompress each sample straight into its preallocated memmap row,
+  files decoded concurrently (each one owns a disjoint row range)
+Memory stays at roughly one sample regardless of dataset size (the scan keeps only
+paths/shapes/metadata). Output layout matches utils.merge_memmap: features.dat + meta.json,
+plus aligned per-row side columns (<name>.int32 + columns.json string tables: labels,
+aug_index, user, session_id, dialect, source), valid.dat (uint8 per row, 0 = tombstone)
+and manifest.json for incremental exports:
+- export_incremental: append rows for new/changed files only, tombstone deleted/changed ones
+  (full re-export when the augmentation recipes' fingerprint differs from the manifest's)
+- compact: drop tombstoned rows (on request)
+write_memmap, export_incremental and compact serialize on export_lock(output_dir).
+"""
+
+import json
+import os
+import zipfile
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.processing import storage_utils as su
+from app.processing.augmenter import expand_sample, get_recipe, recipes_fingerprint
+from app.processing.utils import parallel_map
+
+ARRAY_KEYS = ("sequence", "sequences")
+FEATURES = "features.dat"
+VALID = "valid.dat"
+MANIFEST = "manifest.json"
+# side columns: one little-endian int32 per row. labels = class_idx (-1 unknown);
+# categorical columns hold codes into the string tables in columns.json
+CATEGORICAL = ("user", "session_id", "dialect", "source")
+COLUMNS = ("labels", "aug_index") + CATEGORICAL
+COLUMN_TABLES = "columns.json"
+
+
+def read_npz_header(path: Path):
+    """(member name, shape, dtype, fortran_order) of the sequence array, without decompressing it."""
+    with zipfile.ZipFile(path) as zf:
+        names = set(zf.namelist())
+        member = next((k + ".npy" for k in ARRAY_KEYS if k + ".npy" in names), None)
+        if member is None:
+            raise ValueError("no sequence array")
+        with zf.open(member) as f:
+            shape, fortran, dtype = _read_header(f)
+    return member, shape, dtype, fortran
+
+
+def _read_header(f):
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    return np.lib.format.read_array_header_2_0(f)
+
+
+def _read_meta(path: Path) -> dict:
+    meta_path = path.with_suffix(".json")
+    if not meta_path.exists():
+        return {}
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def list_samples(base_dir: Path) -> List[Path]:
+    return sorted(Path(base_dir).rglob("*.npz"), key=str)
+
+
+def scan_samples(base_dir: Path, expected_T: int = None, expected_D: int = None) -> Dict[str, Any]:
+    """
+    Pass 1. Returns {"base_dir", "entries", "files", "target_shape", "total_rows", "mismatches", "errors"}.
+    Each entry: path, member, shape, dtype, fortran, meta, class_idx, rows (variants for lazy samples).
+    Target (T, D) is expected_T/expected_D or the most common shape. Entries with another T are
+    padded/truncated on write (like merge_memmap); another D is a mismatch and is not exported.
+    """
+    return scan_files(base_dir, list_samples(base_dir), expected_T, expected_D)
+
+
+def scan_files(base_dir: Path, paths: List[Path], expected_T: int = None, expected_D: int = None) -> Dict[str, Any]:
+    """scan_samples for an explicit list of .npz paths under base_dir."""
+    entries, errors = [], []
+    files = 0
+    shapes = Counter()
+    for p in paths:
+        files += 1
+        try:
+            member, shape, dtype, fortran = read_npz_header(p)
+        except Exception as e:
+            errors.append({"file": str(p), "error": str(e)})
+            continue
+        if len(shape) != 2:
+            errors.append({"file": str(p), "shape": shape, "error": "ndim!=2"})
+            continue
+        meta = _read_meta(p)
+        try:
+            class_idx = int(meta["class_idx"]) if meta.get("class_idx") is not None else None
+        except (TypeError, ValueError):
+            class_idx = None
+        try:
+            # lazy samples expand to the recipe's current variant count
+            rows = len(get_recipe(meta["aug_recipe"])) if meta.get("aug_recipe") else 1
+        except KeyError as e:
+            errors.append({"file": str(p), "error": str(e)})
+            continue
+        entries.append({
+            "path": p, "member": member, "shape": tuple(shape), "dtype": dtype, "fortran": fortran,
+            "meta": meta, "class_idx": class_idx, "rows": rows,
+        })
+        shapes[tuple(shape)] += 1
+
+    if not entries:
+        return {"base_dir": Path(base_dir), "entries": [], "files": files, "target_shape": None,
+                "total_rows": 0, "mismatches": [], "errors": errors}
+
+    mode_T, mode_D = shapes.most_common(1)[0][0]
+    T = expected_T or mode_T
+    D = expected_D or mode_D
+    mismatches = [
+        {"file": str(e["path"]), "shape": e["shape"]}
+        for e in entries if e["shape"] != (T, D)
+    ]
+    entries = [e for e in entries if e["shape"][1] == D]
+    return {
+        "base_dir": Path(base_dir),
+        "entries": entries,
+        "files": files,
+        "target_shape": (int(T), int(D)),
+        "total_rows": sum(e["rows"] for e in entries),
+        "mismatches": mismatches,
+        "errors": errors,
+    }
+
+
+def _read_row_into(path: Path, entry: dict, row: np.ndarray) -> bool:
+    """Decompress a float32 C-order (T, D) array directly into `row`. False if a copy path is needed."""
+    if entry["fortran"] or entry["dtype"] != np.dtype("<f4") or entry["shape"] != row.shape:
+        return False
+    with zipfile.ZipFile(path) as zf, zf.open(entry["member"]) as f:
+        _read_header(f)
+        buf = memoryview(row).cast("B")
+        pos = 0
+        while pos < len(buf):
+            n = f.readinto(buf[pos:])
+            if not n:
+                raise ValueError(f"truncated array in {path}")
+            pos += n
+    return True
+
+
+def _load_sequence(path: Path, member: str) -> np.ndarray:
+    with np.load(path, allow_pickle=False) as data:
+        return np.asarray(data[member[:-len(".npy")]], dtype=np.float32)
+
+
+def _fit(seq: np.ndarray, T: int) -> np.ndarray:
+    if seq.shape[0] == T:
+        return seq
+    out = np.zeros((T, seq.shape[1]), dtype=np.float32)
+    n = min(T, seq.shape[0])
+    out[:n] = seq[:n]
+    return out
+
+
+def fill_entry(entry: dict, rows: np.ndarray):
+    """Decode one scanned entry into rows (entry["rows"], T, D): straight into the buffer when possible."""
+    if entry["rows"] == 1 and _read_row_into(entry["path"], entry, rows[0]):
+        return
+    seq = _fit(_load_sequence(entry["path"], entry["member"]), rows.shape[1])
+    for j, (variant, _) in enumerate(expand_sample(seq, entry["meta"])):
+        rows[j] = variant
+
+
+def row_starts(entries: List[dict]) -> List[int]:
+    """First row of each entry when entries are laid out consecutively."""
+    return np.concatenate([[0], np.cumsum([e["rows"] for e in entries])[:-1]]).astype(int).tolist()
+
+
+def _fill_rows(entries: List[dict], mmap: np.ndarray, workers: int = None) -> List[int]:
+    """Decode entries into consecutive rows of mmap (N, T, D); returns each entry's first row."""
+    starts = row_starts(entries)
+
+    def fill(k):
+        fill_entry(entries[k], mmap[starts[k]:starts[k] + entries[k]["rows"]])
+
+    parallel_map(fill, range(len(entries)), workers)
+    return starts
+
+
+def export_lock(output_dir: Path):
+    """Inter-process lock serializing every writer of one export directory (<output_dir>.lock)."""
+    return su.locked(str(Path(output_dir)))
+
+
+def write_memmap(scan: Dict[str, Any], output_dir: Path, workers: int = None) -> Dict[str, Any]:
+    """
+    Pass 2: fill features.dat (N, T, D) float32 and write meta.json (+ valid.dat and
+    manifest.json, so a later export_incremental can continue from here).
+    workers: decode threads (utils.parallel_map; None -> settings.export_workers).
+    Holds export_lock(output_dir) while writing.
+    """
+    if not scan["entries"]:
+        raise ValueError("No samples provided to write_memmap")
+    with export_lock(output_dir):
+        return _write_memmap(scan, output_dir, workers)
+
+
+def _write_memmap(scan: Dict[str, Any], output_dir: Path, workers: int = None) -> Dict[str, Any]:
+    entries = scan["entries"]
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    T, D = scan["target_shape"]
+    N = scan["total_rows"]
+
+    memmap_path = out / FEATURES
+    mmap = np.memmap(str(memmap_path), dtype="float32", mode="w+", shape=(N, T, D))
+    starts = _fill_rows(entries, mmap, workers)
+    mmap.flush()
+    del mmap
+    np.ones(N, dtype=np.uint8).tofile(out / VALID)
+    tables = {name: [] for name in CATEGORICAL}
+    _write_columns(out, column_values(entries, tables), tables, 0)
+
+    manifest = {"shape": [T, D], "rows": N, "recipes": recipes_fingerprint(), "files": {}}
+    _record(manifest, scan["base_dir"], entries, starts, 0)
+    save_manifest(out, manifest)
+    return _write_meta(out, manifest)
+
+
+# ---- Columnar side arrays ----
+def column_path(output_dir: Path, name: str) -> Path:
+    return Path(output_dir) / f"{name}.int32"
+
+
+def load_tables(output_dir: Path) -> Dict[str, List[str]]:
+    path = Path(output_dir) / COLUMN_TABLES
+    if not path.exists():
+        return {name: [] for name in CATEGORICAL}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_columns(output_dir: Path, mmap_mode: str = "r") -> Dict[str, np.ndarray]:
+    """Every side column as an (N,) int32 memmap (plus "valid" as uint8)."""
+    out = Path(output_dir)
+    cols = {name: np.memmap(str(column_path(out, name)), dtype="<i4", mode=mmap_mode) for name in COLUMNS}
+    cols["valid"] = np.memmap(str(out / VALID), dtype=np.uint8, mode=mmap_mode)
+    return cols
+
+
+def column_values(entries: List[dict], tables: Dict[str, List[str]]) -> Dict[str, np.ndarray]:
+    """Per-row column values for entries (in row order); new strings are appended to `tables`."""
+    n = sum(e["rows"] for e in entries)
+    cols = {name: np.empty(n, dtype="<i4") for name in COLUMNS}
+    codes = {name: {v: i for i, v in enumerate(tables[name])} for name in CATEGORICAL}
+    i = 0
+    for e in entries:
+        meta, k = e["meta"], e["rows"]
+        cols["labels"][i:i + k] = -1 if e["class_idx"] is None else e["class_idx"]
+        if meta.get("aug_recipe"):
+            cols["aug_index"][i:i + k] = np.arange(k)
+        else:
+            cols["aug_index"][i:i + k] = int(meta.get("aug_index") or 0)
+        for name in CATEGORICAL:
+            value = str(meta.get(name) or "")
+            code = codes[name].get(value)
+            if code is None:
+                code = codes[name][value] = len(tables[name])
+                tables[name].append(value)
+            cols[name][i:i + k] = code
+        i += k
+    return cols
+
+
+def _write_columns(out: Path, cols: Dict[str, np.ndarray], tables: Dict[str, List[str]], offset: int):
+    """Write rows [offset, offset + n) of every column file; offset 0 starts the files over."""
+    for name, values in cols.items():
+        with open(column_path(out, name), "r+b" if offset else "wb") as f:
+            f.seek(offset * 4)
+            f.write(values.astype("<i4").tobytes())
+    (out / COLUMN_TABLES).write_text(json.dumps(tables, ensure_ascii=False), encoding="utf-8")
+
+
+# ---- Incremental export ----
+def _stamp(path: Path) -> List[int]:
+    """Change detector for a sample: npz mtime/size + sidecar mtime."""
+    st = os.stat(path)
+    meta_path = path.with_suffix(".json")
+    meta_mtime = os.stat(meta_path).st_mtime_ns if meta_path.exists() else 0
+    return [st.st_mtime_ns, st.st_size, meta_mtime]
+
+
+def _record(manifest: dict, base_dir: Path, entries: List[dict], starts: List[int], offset: int):
+    for e, start in zip(entries, starts):
+        rel = e["path"].relative_to(base_dir).as_posix()
+        manifest["files"][rel] = {"start": offset + start, "rows": e["rows"], "stamp": _stamp(e["path"])}
+
+
+def load_manifest(output_dir: Path):
+    path = Path(output_dir) / MANIFEST
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_manifest(output_dir: Path, manifest: dict):
+    path = Path(output_dir) / MANIFEST
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _write_meta(out: Path, manifest: dict) -> Dict[str, Any]:
+    T, D = manifest["shape"]
+    N = manifest["rows"]
+    live = sum(f["rows"] for f in manifest["files"].values())
+    meta = {
+        "total_samples": N,
+        "live_samples": live,
+        "tombstoned": N - live,
+        "shape": [N, T, D],
+        "dtype": "float32",
+        "memmap_path": str(out / FEATURES),
+        "valid_path": str(out / VALID),
+        "columns": {name: str(column_path(out, name)) for name in COLUMNS},
+        "tables_path": str(out / COLUMN_TABLES),
+    }
+    meta_path = out / "meta.json"
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return {**meta, "meta_path": str(meta_path)}
+
+
+def _grow(path: Path, size: int):
+    """Extend a file to `size` bytes (new bytes read as zeros)."""
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+
+def export_incremental(base_dir: Path, output_dir: Path, expected_T: int = None, expected_D: int = None,
+                       workers: int = None) -> Dict[str, Any]:
+    """
+    Bring an existing export up to date. New or changed samples are appended to the end
+    of features.dat; rows of deleted/changed samples are tombstoned in valid.dat. Only
+    the delta is decoded (unchanged files cost one stat). Falls back to a full export
+    when there is no manifest, the target (T, D) changed, or the augmentation recipes
+    changed (lazy samples would otherwise keep rows materialized from the old ones).
+    Runs under export_lock(output_dir), so overlapping exports/compactions queue up.
+    """
+    with export_lock(output_dir):
+        return _export_incremental(Path(base_dir), Path(output_dir), expected_T, expected_D, workers)
+
+
+def _export_incremental(base: Path, out: Path, expected_T: int, expected_D: int, workers: int) -> Dict[str, Any]:
+    manifest = load_manifest(out)
+    T, D = expected_T, expected_D
+    required = [out / FEATURES, out / VALID] + [column_path(out, name) for name in COLUMNS]
+    if (manifest is None or not all(p.exists() for p in required) or (T and D and manifest["shape"] != [T, D])
+            or manifest.get("recipes") != recipes_fingerprint()):
+        scan = scan_samples(base, T, D)
+        if not scan["entries"]:
+            raise ValueError("No samples provided to write_memmap")
+        return {**_write_memmap(scan, out, workers), "mode": "full", "report": scan_report(scan)}
+
+    T, D = manifest["shape"]
+    files = manifest["files"]
+    current = {p.relative_to(base).as_posix(): p for p in list_samples(base)}
+    stale = [rel for rel, f in files.items() if rel not in current or f["stamp"] != _stamp(current[rel])]
+    added = [current[rel] for rel in current if rel not in files or rel in stale]
+
+    N_old = manifest["rows"]
+    if stale:
+        valid = np.memmap(str(out / VALID), dtype=np.uint8, mode="r+", shape=(N_old,))
+        for rel in stale:
+            f = files.pop(rel)
+            valid[f["start"]:f["start"] + f["rows"]] = 0
+        valid.flush()
+        del valid
+
+    scan = scan_files(base, added, T, D)
+    n_new = scan["total_rows"]
+    if n_new:
+        row_bytes = T * D * 4
+        _grow(out / FEATURES, (N_old + n_new) * row_bytes)
+        mmap = np.memmap(str(out / FEATURES), dtype="float32", mode="r+",
+                         offset=N_old * row_bytes, shape=(n_new, T, D))
+        starts = _fill_rows(scan["entries"], mmap, workers)
+        mmap.flush()
+        del mmap
+        _grow(out / VALID, N_old + n_new)
+        valid = np.memmap(str(out / VALID), dtype=np.uint8, mode="r+", offset=N_old, shape=(n_new,))
+        valid[:] = 1
+        valid.flush()
+        del valid
+        tables = load_tables(out)
+        _write_columns(out, column_values(scan["entries"], tables), tables, N_old)
+        _record(manifest, base, scan["entries"], starts, N_old)
+        manifest["rows"] = N_old + n_new
+
+    save_manifest(out, manifest)
+    return {
+        **_write_meta(out, manifest),
+        "mode": "incremental",
+        "added_files": len(scan["entries"]),
+        "removed_files": len(stale),
+        "appended_rows": n_new,
+        "report": scan_report(scan),
+    }
+
+
+def compact(output_dir: Path) -> Dict[str, Any]:
+    """Rewrite features.dat without tombstoned rows (file order kept), one sample's rows at a time."""
+    with export_lock(output_dir):
+        return _compact(Path(output_dir))
+
+
+def _compact(out: Path) -> Dict[str, Any]:
+    manifest = load_manifest(out)
+    if manifest is None:
+        raise ValueError("no export manifest to compact")
+    T, D = manifest["shape"]
+    N_old = manifest["rows"]
+    order = sorted(manifest["files"].items(), key=lambda kv: kv[1]["start"])
+    N = sum(f["rows"] for _, f in order)
+
+    live = np.fromfile(out / VALID, dtype=np.uint8) == 1
+    src = np.memmap(str(out / FEATURES), dtype="float32", mode="r", shape=(N_old, T, D))
+    tmp = out / (FEATURES + ".tmp")
+    dst = np.memmap(str(tmp), dtype="float32", mode="w+", shape=(max(N, 1), T, D))
+    i = 0
+    for _, f in order:
+        dst[i:i + f["rows"]] = src[f["start"]:f["start"] + f["rows"]]
+        f["start"] = i
+        i += f["rows"]
+    dst.flush()
+    del dst, src
+    with open(tmp, "r+b") as fh:
+        fh.truncate(N * T * D * 4)
+    os.replace(tmp, out / FEATURES)
+    np.ones(N, dtype=np.uint8).tofile(out / VALID)
+    # live rows are exactly the valid ones, already in start order
+    for name in COLUMNS:
+        np.fromfile(column_path(out, name), dtype="<i4")[live].tofile(column_path(out, name))
+
+    manifest["rows"] = N
+    manifest["files"] = dict(order)
+    save_manifest(out, manifest)
+    return {**_write_meta(out, manifest), "removed_rows": N_old - N}
+
+
+def scan_report(scan: Dict[str, Any]) -> Dict[str, Any]:
+    """Validation-style summary of a scan (same keys as validator.validate_samples where they overlap)."""
+    bad: List[dict] = scan["mismatches"] + scan["errors"]
+    return {
+        "ok": not bad,
+        "target_shape": scan["target_shape"],
+        "total_samples": scan["files"],
+        "total_rows": scan["total_rows"],
+        "mismatch_count": len(bad),
+        "mismatches": bad,
+    }
+
+
+def export_memmap(base_dir: Path, output_dir: Path, expected_T: int = None, expected_D: int = None,
+                  workers: int = None) -> Dict[str, Any]:
+    """Scan + write in one call. Returns the write_memmap meta plus the scan report."""
+    scan = scan_samples(base_dir, expected_T, expected_D)
+    return {**write_memmap(scan, output_dir, workers), "report": scan_report(scan)}
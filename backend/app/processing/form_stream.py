@@ -0,0 +1,121 @@
+"""
+Single-pass multipart/form-data upload
+- The request body is parsed as it arrives (python-multipart's push parser); the one
+  file part is written straight to its destination and hashed (sha256) on the way
+- Text fields are collected in memory (they are small: user, label, ...)
+Unlike Request.form() / UploadFile there is no intermediate SpooledTemporaryFile,
+so every uploaded byte is written to disk once.
+"""
+
+import hashlib
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiofiles
+from multipart.multipart import MultipartParser, parse_options_header
+
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class FormStreamError(ValueError):
+    """Malformed or unexpected multipart body (maps to HTTP 400/422)."""
+
+
+class StreamedForm:
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.size = 0
+        self.sha256 = ""
+
+
+async def stream_form_file(content_type: str, stream: AsyncIterator[bytes], file_field: str,
+                           dest_path: str) -> StreamedForm:
+    """
+    Parse a multipart body from `stream`, writing the part named `file_field` to dest_path.
+    Returns the text fields, the client filename, the file size and its sha256 hex digest.
+    Raises FormStreamError if the body is not multipart, is truncated (no closing
+    boundary), has no such file part, has more than one, or a text field exceeds
+    MAX_FIELD_BYTES.
+    """
+    ctype, params = parse_options_header(content_type or "")
+    if ctype != b"multipart/form-data" or b"boundary" not in params:
+        raise FormStreamError("expected multipart/form-data with a boundary")
+    charset = params.get(b"charset", b"utf-8")
+    charset = charset.decode("latin-1") if isinstance(charset, bytes) else charset
+
+    form = StreamedForm()
+    digest = hashlib.sha256()
+    state = {"name": None, "is_file": False, "data": b"", "header": b"", "value": b"", "disposition": b"",
+             "file_done": False, "ended": False}
+    pending: List[bytes] = []
+
+    def on_part_begin():
+        state.update(name=None, is_file=False, data=b"", disposition=b"")
+
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        if state["header"].lower() == b"content-disposition":
+            state["disposition"] = state["value"]
+        state["header"] = state["value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["disposition"])
+        if b"name" not in options:
+            raise FormStreamError('Content-Disposition needs a "name"')
+        state["name"] = options[b"name"].decode(charset, errors="replace")
+        if b"filename" in options and state["name"] == file_field:
+            if form.filename is not None:
+                raise FormStreamError(f"more than one '{file_field}' file part")
+            form.filename = options[b"filename"].decode(charset, errors="replace")
+            state["is_file"] = True
+
+    def on_part_data(data, start, end):
+        if state["is_file"]:
+            pending.append(bytes(data[start:end]))
+        else:
+            state["data"] += data[start:end]
+            if len(state["data"]) > MAX_FIELD_BYTES:
+                raise FormStreamError(f"field '{state['name']}' is too large")
+
+    def on_part_end():
+        if state["is_file"]:
+            state["file_done"] = True
+        elif state["name"] is not None:
+            form.fields[state["name"]] = state["data"].decode(charset, errors="replace")
+
+    def on_end():
+        state["ended"] = True
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_end": on_end,
+    })
+    async with aiofiles.open(dest_path, "wb") as out:
+        async for chunk in stream:
+            parser.write(chunk)
+            # callbacks are synchronous; file data is written here, off the parser
+            for piece in pending:
+                digest.update(piece)
+                form.size += len(piece)
+                await out.write(piece)
+            pending.clear()
+    parser.finalize()
+
+    # a body cut off mid-upload just stops; only the closing boundary proves it is complete
+    if not state["ended"]:
+        raise FormStreamError("multipart body ended before its closing boundary")
+    if form.filename is None or not state["file_done"]:
+        raise FormStreamError(f"missing file part '{file_field}'")
+    form.sha256 = digest.hexdigest()
+    return form
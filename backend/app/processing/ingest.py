@@ -1,24 +1,134 @@
 import cv2, os
+import queue
+import threading
 from app.processing.utils import ensure_dir
 
-def sample_frames_from_video(video_path: str, target_fps: float = 5.0):
+# tolerance when comparing frame timestamps to the sampling grid (ms)
+_TS_TOLERANCE_MS = 1.0
+
+def downscale_frame(frame, max_side: int):
+    """Shrink frame (INTER_AREA) so its longer side is at most max_side; 0 disables."""
+    if not max_side:
+        return frame
+    h, w = frame.shape[:2]
+    longest = max(h, w)
+    if longest <= max_side:
+        return frame
+    scale = max_side / float(longest)
+    return cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+def iter_sampled_frames(video_path: str, target_fps: float = 5.0, max_side: int = 0):
     """
-    Decode video and sample frames roughly at target_fps.
-    Returns list of BGR numpy arrays.
+    Decode video and yield BGR frames sampled at target_fps by timestamp.
+    Skipped frames are only grab()bed (demuxed, not converted); retrieve() runs
+    for kept frames only. Frame choice follows real timestamps (CAP_PROP_POS_MSEC),
+    so VFR and 25/29.97 fps sources keep accurate timing.
+    max_side > 0 downscales kept frames right after decode (landmarks are normalized,
+    so this mostly just cuts inference and memory cost).
+    """
+    for _, frame in iter_sampled_frames_indexed(video_path, target_fps, max_side):
+        yield frame
+
+def iter_sampled_frames_indexed(video_path: str, target_fps: float = 5.0, max_side: int = 0,
+                                start_frame: int = 0, end_frame: int = None):
+    """
+    Same sampling as iter_sampled_frames, restricted to source frames
+    [start_frame, end_frame), yielding (source_frame_index, frame).
+    The sampling grid stays anchored at t=0, so after one grid step a segment
+    keeps exactly the frames a full pass would keep.
     """
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise RuntimeError("Cannot open video file")
     video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    sample_rate = max(1, int(video_fps / target_fps))
-    frames = []
+    step_ms = 1000.0 / target_fps if target_fps and target_fps > 0 else 0.0
+    next_ms = 0.0
     idx = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if idx % sample_rate == 0:
-            frames.append(frame)
-        idx += 1
-    cap.release()
-    return frames
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        idx = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) or start_frame
+    try:
+        while (end_frame is None or idx < end_frame) and cap.grab():
+            ts = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if idx > 0 and ts <= 0:
+                # backend without timestamps: assume constant frame rate
+                ts = idx * 1000.0 / video_fps
+            if start_frame > 0 and next_ms == 0.0 and step_ms > 0:
+                # first frame after a seek: align to the global grid
+                next_ms = (int(ts // step_ms)) * step_ms
+            frame_idx = idx
+            idx += 1
+            if ts + _TS_TOLERANCE_MS < next_ms:
+                continue
+            ok, frame = cap.retrieve()
+            if ok:
+                yield frame_idx, downscale_frame(frame, max_side)
+            # next grid slot after this frame (skips slots when the source is slower)
+            while next_ms <= ts + _TS_TOLERANCE_MS and step_ms > 0:
+                next_ms += step_ms
+    finally:
+        cap.release()
+
+def video_frame_info(video_path: str):
+    """(frame_count, fps) from container metadata."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("Cannot open video file")
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0), cap.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        cap.release()
+
+def sample_frames_from_video(video_path: str, target_fps: float = 5.0, max_side: int = 0):
+    """
+    Decode video and sample frames roughly at target_fps.
+    Returns list of BGR numpy arrays.
+    """
+    return list(iter_sampled_frames(video_path, target_fps, max_side))
+
+_END = object()
+
+def prefetch(iterable, maxsize: int = 4):
+    """
+    Run `iterable` in a background thread and yield its items through a bounded queue.
+    Lets decode overlap with the consumer (MediaPipe) while holding at most
+    maxsize + 2 items in memory. Producer exceptions are re-raised in the consumer.
+    """
+    q = queue.Queue(maxsize=max(1, int(maxsize)))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    worker = threading.Thread(target=produce, name="frame-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
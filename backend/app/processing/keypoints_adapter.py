@@ -2,43 +2,186 @@
 Refactored keypoints extraction from collect_dataset.py
 - Extract Mediapipe Hands landmarks only
 - Flatten into fixed-length vector
+- Per-process pool of pre-warmed Hands graphs (see init_hands_pool)
+- Results are written straight into a preallocated (T_max, 126) float32 buffer (write_keypoints)
 """
 
-from typing import List
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterable
+import cv2
 import numpy as np
 import mediapipe as mp
 
+from app.config import settings
+
 # constants for hands only
 N_HAND = 21
+HAND_D = N_HAND * 3  # 63
+D_HANDS = 2 * HAND_D  # 126
+# column offset of each hand's block in a frame row
+HAND_SLOTS = {"Left": 0, "Right": HAND_D}
+
 
-def extract_sequence_from_frames(frames: List[np.ndarray], config: dict = None):
+def hands_options() -> dict:
+    """Hands() keyword arguments from Settings."""
+    return {
+        "static_image_mode": False,
+        "max_num_hands": 2,
+        "model_complexity": settings.hands_model_complexity,
+        "min_detection_confidence": settings.hands_min_detection_confidence,
+        "min_tracking_confidence": settings.hands_min_tracking_confidence,
+    }
+
+
+class HandsPool:
+    """
+    Pool of MediaPipe Hands instances for one process. Graph setup is paid once
+    (warm) instead of per video; instances are reset() between checkouts so
+    tracking state never leaks from one video into the next.
     """
-    frames: list of BGR images
+
+    def __init__(self, size: int = 1, **options):
+        self.size = max(1, int(size))
+        self.options = options or hands_options()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new(self):
+        hands = mp.solutions.hands.Hands(**self.options)
+        # run one blank frame so the graph and models are fully initialized
+        hands.process(np.zeros((64, 64, 3), dtype=np.uint8))
+        hands.reset()
+        return hands
+
+    def warm(self):
+        with self._lock:
+            while self._created < self.size:
+                self._idle.put(self._new())
+                self._created += 1
+
+    @contextmanager
+    def checkout(self):
+        """Borrow an instance (blocks when all `size` instances are in use)."""
+        hands = None
+        try:
+            hands = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    hands = self._new()
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                hands = self._idle.get()
+        try:
+            yield hands
+        finally:
+            hands.reset()
+            self._idle.put(hands)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_hands_pool() -> HandsPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = HandsPool(settings.hands_pool_size, **hands_options())
+        return _POOL
+
+
+def init_hands_pool():
+    """Create and pre-warm this process's pool (Celery worker_process_init)."""
+    get_hands_pool().warm()
+
+
+def close_hands_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+
+def extract_sequence_from_frames(frames: Iterable[np.ndarray], config: dict = None, t_max: int = None):
+    """
+    frames: iterable of BGR images (list or a streaming generator, consumed one by one)
+    t_max: expected frame count; defaults to len(frames) when available. The output
+    buffer doubles if a stream runs longer.
     return: np.ndarray shape (T, D) where D = 2 hands * 21 landmarks * 3 coords = 126
     """
-    mp_hands = mp.solutions.hands
-    seq = []
-    with mp_hands.Hands(
-        static_image_mode=False,
-        max_num_hands=2,
-        model_complexity=1,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    ) as hands:
+    if t_max is None:
+        t_max = len(frames) if hasattr(frames, "__len__") else 64
+    out = np.zeros((max(1, t_max), D_HANDS), dtype=np.float32)
+    flat = memoryview(out).cast("B").cast("f")
+    T = 0
+    rgb = None  # reused RGB buffer, reallocated only when the frame size changes
+    with get_hands_pool().checkout() as hands:
         for frame in frames:
-            img_rgb = frame[:, :, ::-1]
-            results = hands.process(img_rgb)
-            kp_dict = extract_keypoints_from_results(results)
-            vec = flatten_keypoints(kp_dict)
-            seq.append(vec)
-    if len(seq) == 0:
-        return np.zeros((0, 126), dtype=np.float32)  # 2 hands * 21 * 3 = 126
-    return np.stack(seq, axis=0)
+            if T == out.shape[0]:
+                out = np.concatenate([out, np.zeros_like(out)])
+                flat = memoryview(out).cast("B").cast("f")
+            if rgb is None or rgb.shape != frame.shape:
+                rgb = np.empty_like(frame)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+            write_keypoints(hands.process(rgb), flat, T * D_HANDS)
+            T += 1
+    return out[:T]
+
+def write_keypoints(results, flat, offset: int = 0):
+    """
+    Write one frame's hand landmarks into flat[offset:offset + 126].
+    flat: float32 memoryview over a zero-initialized output row (or whole buffer).
+    Left hand -> columns 0..62, right hand -> 63..125; an undetected hand keeps its zeros.
+    Same layout as flatten_keypoints(extract_keypoints_from_results(results)), but
+    without per-hand lists/arrays: each coordinate is stored directly.
+    """
+    if not results.multi_hand_landmarks or not results.multi_handedness:
+        return
+    for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
+        slot = HAND_SLOTS.get(handedness.classification[0].label)
+        if slot is None:
+            continue
+        k = start = offset + slot
+        end = start + HAND_D
+        for lm in hand_landmarks.landmark:
+            if k == end:
+                break
+            flat[k] = lm.x
+            flat[k + 1] = lm.y
+            flat[k + 2] = lm.z
+            k += 3
+        while k < end:
+            # fewer than 21 points (or a second detection with the same label): clear the rest
+            flat[k] = 0.0
+            k += 1
 
 def extract_keypoints_from_results(results):
     """
     Extract hand landmarks from MediaPipe Hands results
     Returns left and right hand keypoints (or zeros if not detected)
+    Per-hand dict form; the extraction loop uses write_keypoints instead.
     """
     def lm_to_list(landmarks, expected_n):
         if not landmarks:
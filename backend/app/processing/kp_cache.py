@@ -0,0 +1,207 @@
+"""
+On-disk cache of raw (unaugmented) keypoint sequences
+- Key: video content sha256 + target fps + ingest/extractor settings
+- Value: (T, 126) float32 .npy under <kp_cache_dir>/<key[:2]>/<key>.npy
+- Size-capped LRU: hits refresh the file mtime, eviction drops the oldest files
+CLI:
+    python -m app.processing.kp_cache warm <video or dir> [...]
+    python -m app.processing.kp_cache clear
+    python -m app.processing.kp_cache stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from app.config import settings
+from app.processing.ingest import iter_sampled_frames, prefetch
+from app.processing.keypoints_adapter import extract_sequence_from_frames, hands_options
+from app.processing.utils import file_sha256
+
+# bump when extraction output changes in a way the settings below don't capture
+CACHE_VERSION = 1
+VIDEO_EXTS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
+
+_evict_lock = threading.Lock()
+
+
+def cache_dir() -> str:
+    return settings.kp_cache_dir
+
+
+def enabled() -> bool:
+    return settings.kp_cache_max_bytes > 0
+
+
+def cache_key(sha256: str, target_fps: float, max_side: int = None) -> str:
+    """Stable key for one video's extraction under the current settings."""
+    max_side = settings.ingest_max_side if max_side is None else max_side
+    parts = {
+        "v": CACHE_VERSION,
+        "sha256": sha256,
+        "fps": float(target_fps),
+        "max_side": int(max_side),
+        "hands": hands_options(),
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(cache_dir(), key[:2], key + ".npy")
+
+
+def get(key: str):
+    """Cached (T, 126) array or None. A hit counts as a use for LRU eviction."""
+    if not enabled():
+        return None
+    path = _path(key)
+    try:
+        seq = np.load(path)
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return seq
+
+
+def put(key: str, seq: np.ndarray):
+    """Store a sequence (atomic rename, so readers never see a partial file), then enforce the size cap."""
+    if not enabled():
+        return
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.asarray(seq, dtype=np.float32))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    evict()
+
+
+def _entries():
+    """[(mtime, size, path), ...] for every cached file."""
+    entries = []
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return entries
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def evict(max_bytes: int = None) -> int:
+    """Remove least recently used entries until the cache fits in max_bytes. Returns files removed."""
+    max_bytes = settings.kp_cache_max_bytes if max_bytes is None else max_bytes
+    with _evict_lock:
+        entries = _entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def clear() -> int:
+    return evict(0)
+
+
+def stats() -> dict:
+    entries = _entries()
+    return {
+        "dir": cache_dir(),
+        "entries": len(entries),
+        "bytes": sum(size for _, size, _ in entries),
+        "max_bytes": settings.kp_cache_max_bytes,
+    }
+
+
+def extract_video_keypoints(video_path: str, target_fps: float = 6.0, max_side: int = None,
+                            sha256: str = None) -> np.ndarray:
+    """
+    Raw (T, 126) keypoints for a video, served from the cache when possible.
+    sha256: content hash if the caller already has it (uploads do), otherwise the file is hashed.
+    """
+    max_side = settings.ingest_max_side if max_side is None else max_side
+    key = None
+    if enabled():
+        key = cache_key(sha256 or file_sha256(video_path), target_fps, max_side)
+        seq = get(key)
+        if seq is not None:
+            return seq
+
+    # frames stream from the decoder thread into MediaPipe; only a few are held at once
+    frames = prefetch(
+        iter_sampled_frames(video_path, target_fps=target_fps, max_side=max_side),
+        settings.ingest_prefetch_frames,
+    )
+    seq = extract_sequence_from_frames(frames)
+    if key is not None:
+        put(key, seq)
+    return seq
+
+
+def _iter_videos(paths):
+    for p in paths:
+        if os.path.isdir(p):
+            for dirpath, _, files in os.walk(p):
+                for name in sorted(files):
+                    if name.lower().endswith(VIDEO_EXTS):
+                        yield os.path.join(dirpath, name)
+        else:
+            yield p
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m app.processing.kp_cache")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    warm = sub.add_parser("warm", help="extract and cache keypoints for videos")
+    warm.add_argument("paths", nargs="+", help="video files or directories")
+    warm.add_argument("--fps", type=float, default=6.0)
+    sub.add_parser("clear", help="remove every cached entry")
+    sub.add_parser("stats", help="entry count and size")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "warm":
+        if not enabled():
+            ap.error("cache is disabled (KP_CACHE_MAX_BYTES=0)")
+        for path in _iter_videos(args.paths):
+            sha = file_sha256(path)
+            if os.path.exists(_path(cache_key(sha, args.fps))):
+                print(f"hit   {path}")
+                continue
+            try:
+                seq = extract_video_keypoints(path, target_fps=args.fps, sha256=sha)
+                print(f"saved {path} T={len(seq)}")
+            except Exception as e:
+                print(f"error {path}: {e}")
+    elif args.cmd == "clear":
+        print(f"removed {clear()} entries")
+    else:
+        print(json.dumps(stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Landmark payload decoding for /upload/camera
+- Vectorized decoder: frames[*].landmarks.{left_hand,right_hand} -> (T, 126) float32
+- Fast path for already-flat numeric lists
+- Fallback per-frame flattening for ragged / unusual payloads
+- Packed binary frames (/upload/camera/binary): header + float32/float16/int16 buffer
+"""
+
+import json
+import struct
+import zlib
+from array import array
+from itertools import chain
+from operator import itemgetter
+from typing import List, Tuple
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for Content-Encoding: zstd
+    zstandard = None
+
+# constants for hands only (same layout as keypoints_adapter)
+N_HAND = 21
+HAND_KEYS = ("left_hand", "right_hand")
+D_HANDS = len(HAND_KEYS) * N_HAND * 3  # 126
+
+_ZERO_POINT = {"x": 0.0, "y": 0.0, "z": 0.0}
+_MISSING_POINT = (None, None, None)
+_XYZ = itemgetter("x", "y", "z")
+
+
+def frames_to_array(frames: List[dict]) -> np.ndarray:
+    """
+    frames: list of {timestamp, landmarks} dicts from the camera payload
+    return: np.ndarray (T, D) float32
+
+    - dict landmarks: each hand is padded/truncated to N_HAND points, so D is always 126
+      (a missing hand is zeros in its own slot, like keypoints_adapter does)
+    - flat numeric lists of equal length: converted in one np.asarray call
+    - anything else (ragged lists, mixed formats): per-frame fallback, padded to the longest frame
+    """
+    raws = [f.get("landmarks") for f in frames]
+    if any(ld is None for ld in raws):
+        raise ValueError("frame missing landmarks")
+
+    if all(type(ld) is dict for ld in raws):
+        try:
+            return _decode_hand_dicts(raws)
+        except (TypeError, ValueError, AttributeError):
+            pass
+    elif all(isinstance(ld, (list, tuple, np.ndarray)) for ld in raws):
+        try:
+            arr = np.asarray(raws, dtype=np.float32)
+            if arr.ndim == 2:
+                return arr
+            if arr.ndim > 2:
+                return arr.reshape(len(raws), -1)
+        except (TypeError, ValueError):
+            pass
+
+    return _stack_ragged([flatten_landmarks(ld) for ld in raws])
+
+
+def _decode_hand_dicts(raws: List[dict]) -> np.ndarray:
+    # Gather every point of every frame into one flat list (T * 42 entries),
+    # then convert all coordinates in one C-level pass.
+    points = []
+    extend = points.extend
+    for ld in raws:
+        for key in HAND_KEYS:
+            hand = ld.get(key) or ()
+            if not isinstance(hand, (list, tuple)):
+                raise TypeError(f"{key} must be a list of points")
+            n = len(hand)
+            if n >= N_HAND:
+                extend(hand[:N_HAND] if n > N_HAND else hand)
+            else:
+                extend(hand)
+                extend([_ZERO_POINT] * (N_HAND - n))
+    try:
+        # common case: every point is {x, y, z} with numbers
+        flat = array("d", chain.from_iterable(map(_XYZ, points)))
+        return np.frombuffer(flat, dtype=np.float64).astype(np.float32).reshape(len(raws), D_HANDS)
+    except (KeyError, TypeError):
+        pass
+    # tolerant path: None points / missing keys / null coords -> nan -> 0
+    vals = [
+        (p.get("x"), p.get("y"), p.get("z")) if type(p) is dict else _MISSING_POINT
+        for p in points
+    ]
+    arr = np.array(vals, dtype=np.float32).reshape(len(raws), D_HANDS)
+    np.nan_to_num(arr, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    return arr
+
+
+def flatten_landmarks(ld):
+    """
+    Convert one frame's landmarks into a flat numeric vector (hands only).
+    Per-frame (slow) path, kept as the fallback for payloads the vectorized decoder rejects.
+    """
+    # If already a list/array of numbers, return as-is
+    if ld is None:
+        return None
+    if isinstance(ld, (list, tuple, np.ndarray)):
+        return np.asarray(ld)
+
+    # If dict (MediaPipe style) with keys for hands only
+    if isinstance(ld, dict):
+        parts = []
+        # Only process hands (left_hand, right_hand) - no pose, no face
+        for key in HAND_KEYS:
+            elems = ld.get(key, [])
+            # each elem is expected to be dict with x,y,z (no visibility for hands)
+            for p in elems:
+                if p is None:
+                    # missing point -> pad zeros (only x,y,z for hands)
+                    parts.extend([0.0, 0.0, 0.0])
+                    continue
+                x = p.get("x") if isinstance(p, dict) else None
+                y = p.get("y") if isinstance(p, dict) else None
+                z = p.get("z") if isinstance(p, dict) else None
+                # Only x,y,z for hands (no visibility)
+                parts.extend([
+                    float(x) if x is not None else 0.0,
+                    float(y) if y is not None else 0.0,
+                    float(z) if z is not None else 0.0,
+                ])
+        return np.array(parts, dtype="float32")
+
+    # Unknown format -> attempt to coerce
+    return np.asarray(ld)
+
+
+def _stack_ragged(rows) -> np.ndarray:
+    """Pad per-frame vectors to the longest one; best-effort flatten of nested rows."""
+    flat_rows = []
+    for row in rows:
+        try:
+            arr = np.asarray(row, dtype=np.float32).flatten()
+        except (TypeError, ValueError):
+            vals = []
+            _collect(row, vals)
+            arr = np.asarray(vals, dtype=np.float32)
+        flat_rows.append(arr)
+
+    maxlen = max([a.size for a in flat_rows])
+    seq = np.zeros((len(flat_rows), maxlen), dtype=np.float32)
+    for i, a in enumerate(flat_rows):
+        seq[i, : a.size] = a
+    return seq
+
+
+def _collect(x, vals):
+    # best-effort flatten for nested dict/list structures
+    if x is None:
+        return
+    if isinstance(x, (int, float)):
+        vals.append(float(x))
+    elif isinstance(x, dict):
+        # prefer x,y,z,visibility order if available
+        for k in ("x", "y", "z", "visibility"):
+            if k in x:
+                try:
+                    vals.append(float(x.get(k) or 0.0))
+                except Exception:
+                    vals.append(0.0)
+        # if dict has nested lists, collect them too
+        for v in x.values():
+            if isinstance(v, (list, tuple)):
+                for it in v:
+                    _collect(it, vals)
+    elif isinstance(x, (list, tuple, np.ndarray)):
+        for it in x:
+            _collect(it, vals)
+
+
+# ---- Packed binary frames ----
+# Layout (little endian):
+#   header  "<4sBBHIIfI": magic b"SGNL", version, dtype code, flags (0), T, D, scale, meta_len
+#   meta    meta_len bytes of UTF-8 JSON ({user, label, session_id, dialect})
+#   data    T*D values of the given dtype, row-major
+# dtype codes: 0 = float32, 1 = float16, 2 = int16 quantized (value = q * scale)
+PACKED_MAGIC = b"SGNL"
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct("<4sBBHIIfI")
+PACKED_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2"), 2: np.dtype("<i2")}
+PACKED_MEDIA_TYPE = "application/x-sign-frames"
+
+# upper bound for decompressed bodies (60x126 float32 is ~30 KB)
+MAX_PACKED_BYTES = 16 * 1024 * 1024
+
+
+class PayloadTooLarge(ValueError):
+    """Packed body (raw or decompressed) over MAX_PACKED_BYTES."""
+
+
+def decompress_body(body: bytes, content_encoding: str = "") -> bytes:
+    """
+    Undo Content-Encoding (identity, gzip, zstd). Every encoding is capped at
+    MAX_PACKED_BYTES of output (PayloadTooLarge); other problems raise ValueError.
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding in ("", "identity"):
+        if len(body) > MAX_PACKED_BYTES:
+            raise PayloadTooLarge(f"body larger than {MAX_PACKED_BYTES} bytes")
+        return body
+    if encoding in ("gzip", "x-gzip"):
+        d = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        out = d.decompress(body, MAX_PACKED_BYTES)
+        if d.unconsumed_tail:
+            raise PayloadTooLarge(f"decompressed body larger than {MAX_PACKED_BYTES} bytes")
+        return out
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd encoding requires the 'zstandard' package")
+        # stream_reader ignores the frame's declared content size, so the cap always holds
+        out = bytearray()
+        with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+            while len(out) <= MAX_PACKED_BYTES:
+                chunk = reader.read(MAX_PACKED_BYTES + 1 - len(out))
+                if not chunk:
+                    break
+                out += chunk
+        if len(out) > MAX_PACKED_BYTES:
+            raise PayloadTooLarge(f"decompressed body larger than {MAX_PACKED_BYTES} bytes")
+        return bytes(out)
+    raise ValueError(f"unsupported Content-Encoding: {content_encoding}")
+
+
+def decode_packed_frames(buf: bytes) -> Tuple[np.ndarray, dict]:
+    """
+    Decode a packed frame buffer. Returns ((T, D) float32 array, meta dict).
+    float32 payloads are a zero-copy (read-only) view on buf.
+    """
+    if len(buf) < PACKED_HEADER.size:
+        raise ValueError("packed payload shorter than header")
+    magic, version, code, _flags, T, D, scale, meta_len = PACKED_HEADER.unpack_from(buf, 0)
+    if magic != PACKED_MAGIC:
+        raise ValueError("bad magic, expected SGNL")
+    if version != PACKED_VERSION:
+        raise ValueError(f"unsupported packed version {version}")
+    if code not in PACKED_DTYPES:
+        raise ValueError(f"unknown dtype code {code}")
+    if T == 0 or D == 0:
+        raise ValueError("empty frame buffer")
+
+    offset = PACKED_HEADER.size
+    meta = {}
+    if meta_len:
+        meta = json.loads(bytes(buf[offset:offset + meta_len]).decode("utf-8"))
+        if not isinstance(meta, dict):
+            raise ValueError("packed meta must be a JSON object")
+    offset += meta_len
+
+    dtype = PACKED_DTYPES[code]
+    if len(buf) - offset != T * D * dtype.itemsize:
+        raise ValueError(f"data size mismatch: expected {T}x{D} {dtype.name}")
+    seq = np.frombuffer(buf, dtype=dtype, count=T * D, offset=offset).reshape(T, D)
+    if code == 1:
+        seq = seq.astype(np.float32)
+    elif code == 2:
+        seq = seq.astype(np.float32) * np.float32(scale)
+    return seq, meta
+
+
+def encode_packed_frames(seq: np.ndarray, meta: dict = None, dtype: str = "float32") -> bytes:
+    """Inverse of decode_packed_frames (used by clients/scripts). dtype: float32 | float16 | int16."""
+    seq = np.asarray(seq, dtype=np.float32)
+    T, D = seq.shape
+    scale = 1.0
+    if dtype == "float32":
+        code, data = 0, seq.astype("<f4")
+    elif dtype == "float16":
+        code, data = 1, seq.astype("<f2")
+    elif dtype == "int16":
+        peak = float(np.abs(seq).max()) if seq.size else 0.0
+        scale = peak / 32767.0 if peak > 0 else 1.0
+        code, data = 2, np.round(seq / scale).astype("<i2")
+    else:
+        raise ValueError(f"unsupported dtype {dtype}")
+    meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode("utf-8")
+    header = PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, code, 0, T, D, scale, len(meta_bytes))
+    return header + meta_bytes + data.tobytes()
@@ -1,42 +1,71 @@
-from app.processing.ingest import sample_frames_from_video
-from app.processing.keypoints_adapter import extract_sequence_from_frames
-from app.processing.augmenter import generate_augmented_sequences
+from app.processing.kp_cache import extract_video_keypoints
+from app.config import settings
+from app.processing.augmenter import generate_augmented_sequences, get_recipe, new_seed
+from app.processing.activity import detect_sign_segments
 from app.processing import storage_utils as su
 import numpy as np
 import os
 
-def process_video_job(video_path: str, user: str, label: str, session_id: str, dialect: str = ""):
+TARGET_T = 60
+
+def process_video_job(video_path: str, user: str, label: str, session_id: str, dialect: str = "",
+                      multi_sign: bool = False, sha256: str = None):
     """
     Synchronous function to process video without Celery decorator.
     This is called by the Celery task in tasks.py
+    multi_sign: split the recording into sign instances (activity.detect_sign_segments)
+    and save each one as its own sample group.
+    sha256: video content hash; keypoints are looked up in / stored to kp_cache under it.
     """
     try:
-        frames = sample_frames_from_video(video_path, target_fps=6.0)
-        if not frames:
-            raise RuntimeError("No frames extracted")
+        seq = extract_video_keypoints(video_path, target_fps=6.0, sha256=sha256)
+        return save_video_sequence(seq, user, label, session_id, dialect, multi_sign=multi_sign)
 
-        seq = extract_sequence_from_frames(frames)
-        if seq.size == 0:
-            raise RuntimeError("No keypoints extracted")
+    except Exception as e:
+        raise Exception(f"Pipeline processing failed: {str(e)}")
 
-        T, D = seq.shape
-        target_T = 60
-        if T < target_T:
-            pad = np.zeros((target_T - T, D))
-            seq_padded = np.vstack([seq, pad])
-        else:
-            seq_padded = seq[:target_T]
+def fit_length(seq: np.ndarray, target_T: int = TARGET_T) -> np.ndarray:
+    """Zero-pad or truncate (T, D) to (target_T, D)."""
+    T, D = seq.shape
+    if T < target_T:
+        pad = np.zeros((target_T - T, D), dtype=seq.dtype)
+        return np.vstack([seq, pad])
+    return seq[:target_T]
+
+def save_video_sequence(seq: np.ndarray, user: str, label: str, session_id: str, dialect: str = "",
+                        multi_sign: bool = False):
+    """
+    Pad/truncate an extracted (T, 126) keypoint sequence, augment it and save the samples.
+    With multi_sign, every detected sign instance is saved as its own augmented group
+    (falls back to the whole sequence when no activity is found).
+    Shared by process_video_job and the segmented Celery path (tasks.finalize_video_job).
+    """
+    if seq.size == 0:
+        raise RuntimeError("No frames extracted")
 
-        augmented_seq_list = generate_augmented_sequences(seq_padded)
+    spans = detect_sign_segments(seq) if multi_sign else []
+    if not spans:
+        spans = [(0, seq.shape[0])]
 
-        class_idx, folder = su.register_label(label)
-        saved_paths = []
-        for aseq in augmented_seq_list:
-            meta = {"user": user, "session_id": session_id, "frames": target_T, "source": "video", "dialect": dialect}
-            path = su.save_sample(aseq, class_idx, folder, metadata=meta)
-            saved_paths.append(path)
+    class_idx, folder = su.register_label(label)
+    saved_paths = []
+    for i, (start, end) in enumerate(spans):
+        meta = {"user": user, "session_id": session_id, "frames": TARGET_T, "source": "video", "dialect": dialect}
+        if multi_sign:
+            meta.update({"segment_index": i, "segment_start": int(start), "segment_end": int(end), "total_segments": len(spans)})
+        saved_paths += save_augmented(fit_length(seq[start:end]), class_idx, folder, meta)
 
-        return {"status": "success", "saved": saved_paths}
+    return {"status": "success", "saved": saved_paths, "segments": len(spans)}
 
-    except Exception as e:
-        raise Exception(f"Pipeline processing failed: {str(e)}")
+def save_augmented(seq: np.ndarray, class_idx: int, folder: str, metadata: dict, recipe: str = None):
+    """
+    Save one base sequence and its augmentation variants. Returns the saved paths.
+    settings.augment_lazy: a single npz (the base) whose sidecar records aug_recipe/aug_seed;
+    exporters expand it with augmenter.expand_sample. Otherwise every variant is written.
+    """
+    recipe = recipe or settings.augment_recipe
+    if settings.augment_lazy:
+        meta = {**metadata, "augmented": True, "aug_recipe": recipe, "aug_seed": new_seed(),
+                "total_augs": len(get_recipe(recipe))}
+        return [su.save_sample(seq, class_idx, folder, metadata=meta)]
+    return su.save_samples_batch(generate_augmented_sequences(seq, {"recipe": recipe}), class_idx, folder, metadata=metadata)
@@ -0,0 +1,200 @@
+"""
+Resumable (multipart) video uploads
+- initiate: reserve the final file in the upload dir (sized, sparse) + a JSON state file
+- parts: written in place at their byte offset; received ranges are merged in the state
+- complete: only once every byte has arrived (see missing_ranges)
+- abort / sweep_stale: drop an unfinished upload's reserved file and state
+State lives next to the videos in <upload_dir>/.resumable/<upload_id>.json.
+"""
+
+import json
+import os
+import time
+import uuid
+from typing import List, Optional
+
+from app.processing import storage_utils as su
+
+STATE_DIRNAME = ".resumable"
+
+
+def _state_path(upload_dir: str, upload_id: str) -> str:
+    if not upload_id or not all(c in "0123456789abcdef" for c in upload_id):
+        raise KeyError(upload_id)
+    return os.path.join(upload_dir, STATE_DIRNAME, upload_id + ".json")
+
+
+def _write_state(path: str, state: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def create_upload(upload_dir: str, filename: str, size: int, meta: dict) -> dict:
+    """Reserve <upload_dir>/<name> at its full size and return the new state."""
+    upload_id = uuid.uuid4().hex
+    safe_name = os.path.basename(filename or "video.mp4")
+    file_path = os.path.join(
+        upload_dir, f"{meta.get('user', '')}_{meta.get('label', '')}_{upload_id[:8]}_{safe_name}"
+    )
+    os.makedirs(os.path.join(upload_dir, STATE_DIRNAME), exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.truncate(size)
+
+    state = {
+        "upload_id": upload_id,
+        "filename": safe_name,
+        "file_path": file_path,
+        "size": int(size),
+        "received": [],
+        "created_at": su.now_str(),
+        "result": None,
+        "multi_sign": bool(meta.get("multi_sign", False)),
+        **{k: meta.get(k, "") for k in ("user", "label", "dialect", "session_id")},
+    }
+    _write_state(_state_path(upload_dir, upload_id), state)
+    return state
+
+
+def load_state(upload_dir: str, upload_id: str) -> dict:
+    """Raises KeyError for unknown upload ids."""
+    path = _state_path(upload_dir, upload_id)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(upload_id)
+
+
+def _merge(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    merged = []
+    for s, e in sorted(ranges + [[start, end]]):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+
+def record_part(upload_dir: str, upload_id: str, start: int, end: int) -> dict:
+    """Mark bytes [start, end) as received. Safe against concurrent part uploads."""
+    path = _state_path(upload_dir, upload_id)
+    with su.locked(path):
+        state = load_state(upload_dir, upload_id)
+        if end > start:
+            state["received"] = _merge(state["received"], start, end)
+            _write_state(path, state)
+    return state
+
+
+def set_result(upload_dir: str, upload_id: str, result: dict) -> dict:
+    path = _state_path(upload_dir, upload_id)
+    with su.locked(path):
+        state = load_state(upload_dir, upload_id)
+        state["result"] = result
+        _write_state(path, state)
+    return state
+
+
+def missing_ranges(state: dict) -> List[List[int]]:
+    """Byte ranges [start, end) still to be sent."""
+    missing = []
+    pos = 0
+    for s, e in state["received"]:
+        if s > pos:
+            missing.append([pos, s])
+        pos = max(pos, e)
+    if pos < state["size"]:
+        missing.append([pos, state["size"]])
+    return missing
+
+
+def received_bytes(state: dict) -> int:
+    return sum(e - s for s, e in state["received"])
+
+
+def next_offset(state: dict) -> Optional[int]:
+    """First byte the client should resend, or None when complete."""
+    missing = missing_ranges(state)
+    return missing[0][0] if missing else None
+
+
+def status(state: dict) -> dict:
+    return {
+        "upload_id": state["upload_id"],
+        "size": state["size"],
+        "received_bytes": received_bytes(state),
+        "next_offset": next_offset(state),
+        "missing": missing_ranges(state),
+        "result": state.get("result"),
+    }
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _discard(state_path: str, state: dict):
+    """Remove an upload's state (+ lock file) and, unless it completed, its reserved file."""
+    if not state.get("result"):
+        _remove(state["file_path"])
+    _remove(state_path)
+    _remove(state_path + ".lock")
+
+
+def abort_upload(upload_dir: str, upload_id: str) -> dict:
+    """
+    Drop an unfinished upload: its reserved file and state. Raises KeyError for unknown
+    ids and ValueError once completed (the file then belongs to the queued job).
+    """
+    path = _state_path(upload_dir, upload_id)
+    load_state(upload_dir, upload_id)  # unknown id: KeyError before a lock file is created
+    with su.locked(path):
+        state = load_state(upload_dir, upload_id)
+        if state.get("result"):
+            raise ValueError("upload already completed")
+        _discard(path, state)
+    return state
+
+
+def _last_activity(state_path: str, state: dict) -> float:
+    mtimes = [os.stat(state_path).st_mtime]
+    try:
+        mtimes.append(os.stat(state["file_path"]).st_mtime)
+    except FileNotFoundError:
+        pass
+    return max(mtimes)
+
+
+def sweep_stale(upload_dir: str, max_age: float) -> int:
+    """
+    Remove uploads with no activity (state update or part write) for max_age seconds.
+    Unfinished ones lose their reserved file too; completed ones only their state.
+    Returns uploads removed.
+    """
+    state_dir = os.path.join(upload_dir, STATE_DIRNAME)
+    if not os.path.isdir(state_dir):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(state_dir):
+        path = os.path.join(state_dir, name)
+        if name.endswith(".json.lock") and not os.path.exists(path[:-len(".lock")]):
+            _remove(path)  # lock left behind by a request for an upload that was already gone
+            continue
+        if not name.endswith(".json"):
+            continue
+        try:
+            with su.locked(path):
+                state = load_state(upload_dir, name[:-len(".json")])
+                if _last_activity(path, state) >= cutoff:
+                    continue
+                _discard(path, state)
+                removed += 1
+        except (KeyError, FileNotFoundError, ValueError):
+            continue
+    return removed
@@ -0,0 +1,72 @@
+"""
+Multi-segment keypoint extraction for long videos
+- Split a video into contiguous source-frame ranges
+- Extract each range independently (one Celery subtask per segment, see tasks.py)
+- Stitch the per-segment (T_i, 126) arrays back together in order
+Each segment decodes a short warm-up window before its start so MediaPipe's
+tracker has settled by the first frame that is kept; warm-up rows are dropped.
+"""
+
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.processing.ingest import iter_sampled_frames_indexed, prefetch, video_frame_info
+from app.processing.keypoints_adapter import extract_sequence_from_frames
+
+
+def plan_segments(video_path: str, parallelism: int = None, min_seconds: float = None) -> List[Tuple[int, int]]:
+    """
+    Source-frame ranges [(start, end), ...] covering the whole video.
+    A single range means the video is too short (or parallelism <= 1) to be worth splitting.
+    """
+    parallelism = settings.segment_parallelism if parallelism is None else parallelism
+    min_seconds = settings.segment_min_seconds if min_seconds is None else min_seconds
+    if parallelism <= 1:
+        return [(0, None)]
+    frame_count, fps = video_frame_info(video_path)
+    if frame_count <= 0:
+        return [(0, None)]
+    duration = frame_count / fps
+    n = min(max(1, int(parallelism)), max(1, int(duration // max(min_seconds, 1e-6))))
+    if n <= 1:
+        return [(0, None)]
+    bounds = [round(i * frame_count / n) for i in range(n + 1)]
+    ranges = [(bounds[i], bounds[i + 1]) for i in range(n)]
+    # last range runs to EOF: container frame counts are often slightly off
+    ranges[-1] = (ranges[-1][0], None)
+    return ranges
+
+
+def warmup_source_frames(video_path: str, target_fps: float, warmup: int = None) -> int:
+    """Source frames covering `warmup` sampled frames (plus one grid step for sampler alignment)."""
+    warmup = settings.segment_warmup_frames if warmup is None else warmup
+    _, fps = video_frame_info(video_path)
+    per_sample = max(1, math.ceil(fps / target_fps)) if target_fps else 1
+    return (warmup + 1) * per_sample
+
+
+def extract_segment(video_path: str, start: int, end: int = None, target_fps: float = 6.0,
+                    max_side: int = 0, warmup: int = None) -> np.ndarray:
+    """Keypoints (T_i, 126) for sampled frames with source index in [start, end)."""
+    warm_start = max(0, start - warmup_source_frames(video_path, target_fps, warmup)) if start > 0 else 0
+    indices = []
+
+    def frames():
+        for idx, frame in iter_sampled_frames_indexed(video_path, target_fps, max_side, warm_start, end):
+            indices.append(idx)
+            yield frame
+
+    seq = extract_sequence_from_frames(prefetch(frames(), settings.ingest_prefetch_frames))
+    keep = np.asarray(indices, dtype=np.int64) >= start
+    return seq[keep] if len(indices) else seq
+
+
+def stitch(parts: List[np.ndarray]) -> np.ndarray:
+    """Concatenate per-segment arrays in segment order."""
+    parts = [p for p in parts if p is not None and len(p)]
+    if not parts:
+        return np.zeros((0, 126), dtype=np.float32)
+    return np.concatenate(parts, axis=0).astype(np.float32, copy=False)
@@ -0,0 +1,203 @@
+"""
+Sharded export format
+- Fixed number of rows per shard: <out>/<shard_id>/features.dat (rows, T, D) float32
+  plus that shard's side columns (<name>.int32, see export.COLUMNS)
+- shards.json index (shape, shard_size, per-shard start/rows) + columns.json string tables
+- Samples are decoded in parallel (one task per sample, across all shards) into a
+  sibling temp directory that replaces the previous export once complete
+- ShardedDataset maps a shard only when it is first accessed, so a worker can read
+  just its own shards
+"""
+
+import bisect
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.config import settings
+from app.processing import export
+from app.processing.utils import parallel_map
+
+INDEX = "shards.json"
+FORMAT_VERSION = 1
+
+
+def shard_name(k: int) -> str:
+    return f"{k:05d}"
+
+
+def write_shards(scan: Dict[str, Any], output_dir: Path, shard_size: int = None, workers: int = None) -> Dict[str, Any]:
+    """
+    Write a scan (export.scan_samples) as shards of `shard_size` rows (settings.export_shard_size).
+    Replaces any previous sharded export in output_dir: the new one is built in a sibling
+    temp directory and swapped in only once complete, so a failed run leaves the old one.
+    Holds export.export_lock(output_dir) while writing.
+    """
+    entries = scan["entries"]
+    if not entries:
+        raise ValueError("No samples provided to write_shards")
+    shard_size = int(shard_size or settings.export_shard_size)
+    if shard_size <= 0:
+        raise ValueError("shard_size must be positive")
+    out = Path(output_dir)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with export.export_lock(out):
+        tmp = out.parent / f".{out.name}.tmp-{uuid.uuid4().hex[:8]}"
+        try:
+            index = _write_shard_dir(scan, tmp, shard_size, workers)
+            _swap_dir(tmp, out)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    return {**index, "index_path": str(out / INDEX)}
+
+
+def _swap_dir(new: Path, out: Path):
+    """Move the finished export `new` to `out`, removing the previous one only afterwards."""
+    old = None
+    if out.exists():
+        old = out.parent / f".{out.name}.old-{uuid.uuid4().hex[:8]}"
+        os.replace(out, old)
+    os.replace(new, out)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _write_shard_dir(scan: Dict[str, Any], out: Path, shard_size: int, workers: int = None) -> Dict[str, Any]:
+    entries = scan["entries"]
+    out.mkdir()
+    T, D = scan["target_shape"]
+    N = scan["total_rows"]
+
+    starts = export.row_starts(entries)
+    tables = {name: [] for name in export.CATEGORICAL}
+    columns = export.column_values(entries, tables)
+    (out / export.COLUMN_TABLES).write_text(json.dumps(tables, ensure_ascii=False), encoding="utf-8")
+
+    bounds = [(lo, min(lo + shard_size, N)) for lo in range(0, N, shard_size)]
+    mmaps = []
+    for k, (lo, hi) in enumerate(bounds):
+        shard_dir = out / shard_name(k)
+        shard_dir.mkdir()
+        mmaps.append(np.memmap(str(shard_dir / export.FEATURES), dtype="float32", mode="w+", shape=(hi - lo, T, D)))
+
+    def fill(i):
+        # one task per sample (not per shard), so a single large shard still decodes in parallel
+        e, start = entries[i], starts[i]
+        end = start + e["rows"]
+        if start == end:
+            return
+        k = start // shard_size
+        if end <= bounds[k][1]:
+            export.fill_entry(e, mmaps[k][start - bounds[k][0]:end - bounds[k][0]])
+            return
+        # lazy sample whose variants straddle a shard boundary: decode once, copy per shard
+        rows = np.empty((e["rows"], T, D), dtype=np.float32)
+        export.fill_entry(e, rows)
+        while k < len(bounds) and bounds[k][0] < end:
+            lo, hi = bounds[k]
+            a, b = max(start, lo), min(end, hi)
+            mmaps[k][a - lo:b - lo] = rows[a - start:b - start]
+            k += 1
+
+    parallel_map(fill, range(len(entries)), workers)
+    for mmap in mmaps:
+        mmap.flush()
+    del mmaps
+
+    shards = []
+    for k, (lo, hi) in enumerate(bounds):
+        for name, values in columns.items():
+            values[lo:hi].astype("<i4").tofile(export.column_path(out / shard_name(k), name))
+        shards.append({"id": shard_name(k), "start": lo, "rows": hi - lo})
+    index = {
+        "version": FORMAT_VERSION,
+        "shape": [T, D],
+        "dtype": "float32",
+        "shard_size": shard_size,
+        "total_samples": N,
+        "columns": list(export.COLUMNS),
+        "shards": shards,
+    }
+    (out / INDEX).write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
+    return index
+
+
+def export_shards(base_dir: Path, output_dir: Path, expected_T: int = None, expected_D: int = None,
+                  shard_size: int = None, workers: int = None) -> Dict[str, Any]:
+    """Scan + write_shards in one call. Returns the shard index plus the scan report."""
+    scan = export.scan_samples(base_dir, expected_T, expected_D)
+    return {**write_shards(scan, output_dir, shard_size, workers), "report": export.scan_report(scan)}
+
+
+class ShardedDataset:
+    """
+    Read side of the sharded format. Nothing is mapped until used:
+    ds[i] / ds.shard(k) / ds.column(k, name) open that shard's files on first access.
+    For multi-node training, shard_ids(rank, world_size) picks a disjoint subset.
+    """
+
+    def __init__(self, output_dir: Path):
+        self.root = Path(output_dir)
+        self.index = json.loads((self.root / INDEX).read_text(encoding="utf-8"))
+        self.shape = tuple(self.index["shape"])
+        self.shards: List[dict] = self.index["shards"]
+        self._starts = [s["start"] for s in self.shards]
+        self._features = {}
+        self._columns = {}
+        self._tables = None
+
+    def __len__(self) -> int:
+        return self.index["total_samples"]
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.shards)
+
+    @property
+    def tables(self) -> Dict[str, List[str]]:
+        if self._tables is None:
+            self._tables = export.load_tables(self.root)
+        return self._tables
+
+    def shard_ids(self, rank: int = 0, world_size: int = 1) -> List[int]:
+        return list(range(rank, self.num_shards, world_size))
+
+    def shard(self, k: int) -> np.ndarray:
+        """(rows, T, D) read-only memmap of shard k."""
+        if k not in self._features:
+            s = self.shards[k]
+            self._features[k] = np.memmap(
+                str(self.root / s["id"] / export.FEATURES), dtype="float32", mode="r", shape=(s["rows"],) + self.shape
+            )
+        return self._features[k]
+
+    def column(self, k: int, name: str) -> np.ndarray:
+        """(rows,) int32 memmap of one side column of shard k."""
+        key = (k, name)
+        if key not in self._columns:
+            s = self.shards[k]
+            self._columns[key] = np.memmap(
+                str(export.column_path(self.root / s["id"], name)), dtype="<i4", mode="r", shape=(s["rows"],)
+            )
+        return self._columns[key]
+
+    def locate(self, i: int):
+        """Global row -> (shard, row within shard)."""
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        k = bisect.bisect_right(self._starts, i) - 1
+        return k, i - self._starts[k]
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        k, j = self.locate(int(i))
+        return self.shard(k)[j]
+
+    def label(self, i: int) -> int:
+        k, j = self.locate(int(i))
+        return int(self.column(k, "labels")[j])
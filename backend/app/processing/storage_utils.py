@@ -6,18 +6,44 @@ Designed to be production-ready with CSV as source of truth (DB-ready in future)
 
 import os
 import csv
+import io
 import uuid
 import unicodedata
 import re
 import json
 import shutil
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+    import msvcrt
+
 # ---- Config paths ----
 DATASET_ROOT = "dataset"
 FEATURE_ROOT = os.path.join(DATASET_ROOT, "features")
 LABELS_CSV = os.path.join(DATASET_ROOT, "labels.csv")
 SAMPLES_CSV = os.path.join(DATASET_ROOT, "samples.csv")
+VIDEOS_CSV = os.path.join(DATASET_ROOT, "videos.csv")
+
+LABEL_FIELDS = ["class_idx","label_original","slug","folder_name","created_at","dataset_version","notes"]
+VIDEO_FIELDS = ["sha256","label","file","size","job_id","user","session_id","multi_sign","created_at"]
+SAMPLE_FIELDS = ["sample_id","class_idx","folder_name","file","user","session_id","frames","duration","source","dialect","created_at"]
+
+# Shared pool for sample file writes
+IO_WORKERS = 4
+_IO_POOL = None
+
+# Process umask, read once at import (os.umask can only be read by setting it,
+# which would race with other threads creating files)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
 # ---- Utils ----
 def slugify(text: str, maxlen: int = 20) -> str:
@@ -34,6 +60,39 @@ def slugify(text: str, maxlen: int = 20) -> str:
 def now_str() -> str:
     return datetime.utcnow().isoformat() + "Z"
 
+def _io_pool() -> ThreadPoolExecutor:
+    global _IO_POOL
+    if _IO_POOL is None:
+        _IO_POOL = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="sample-io")
+    return _IO_POOL
+
+@contextmanager
+def locked(path):
+    """
+    Exclusive inter-process lock guarding `path` (uses a sidecar `path.lock` file).
+    Safe across uvicorn workers, Celery workers and threads; not reentrant.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "a+b") as lf:
+        if fcntl is not None:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+        else:
+            lf.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lf.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+            else:
+                lf.seek(0)
+                msvcrt.locking(lf.fileno(), msvcrt.LK_UNLCK, 1)
+
 # ---- CSV helpers ----
 def read_csv(csv_path):
     if not os.path.exists(csv_path):
@@ -41,22 +100,156 @@ def read_csv(csv_path):
     with open(csv_path, newline="", encoding="utf-8") as f:
         return list(csv.DictReader(f))
 
+def _file_mode(path):
+    """Permission bits of an existing file, or what open() would give a new one."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
 def write_csv(csv_path, rows, fieldnames):
-    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+    """
+    Rewrite csv_path atomically (temp file in the same dir, then rename).
+    The temp file (mkstemp: 0600) gets the original file's mode first, so the
+    rewrite does not change who can read the CSV.
+    """
+    dirname = os.path.dirname(csv_path)
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=".tmp_", suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.chmod(tmp_path, _file_mode(csv_path))
+        os.replace(tmp_path, csv_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def append_csv(csv_path, rows, fieldnames):
+    """
+    Append rows to csv_path with a single write (O(1) in the size of the file).
+    The header is written when the file is new; if the existing header differs from
+    fieldnames (older layout) the file is compacted once into the current layout.
+    Callers that may race with other processes must hold locked(csv_path).
+    """
+    if not rows:
+        return
+    fieldnames = list(fieldnames)
+    header = None
+    if os.path.exists(csv_path):
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), None)
+    if header is not None and header != fieldnames:
+        write_csv(csv_path, read_csv(csv_path) + list(rows), fieldnames)
+        return
+
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames)
+    if header is None:
         writer.writeheader()
-        writer.writerows(rows)
+    writer.writerows(rows)
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    with open(csv_path, "a", newline="", encoding="utf-8") as f:
+        f.write(buf.getvalue())
+
+# ---- Label index ----
+class _LabelIndex:
+    """
+    In-process view of labels.csv keyed by label_original, class_idx and folder_name.
+    Reloaded only when the file's (mtime, size) changes or after our own writes
+    (generation counter), so lookups are O(1) and a stat() per call.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self._stamp = None
+        self._loaded_generation = -1
+        self._rows = []
+        self._by_name = {}
+        self._by_idx = {}
+        self._by_folder = {}
+
+    def invalidate(self):
+        self.generation += 1
+
+    def _refresh(self):
+        try:
+            st = os.stat(LABELS_CSV)
+            stamp = (LABELS_CSV, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = (LABELS_CSV, None, None)
+        if stamp == self._stamp and self._loaded_generation == self.generation:
+            return
+        rows = read_csv(LABELS_CSV)
+        self._rows = rows
+        self._by_name = {r["label_original"]: r for r in rows}
+        self._by_idx = {int(r["class_idx"]): r for r in rows}
+        self._by_folder = {r["folder_name"]: r for r in rows}
+        self._stamp = stamp
+        self._loaded_generation = self.generation
+
+    def rows(self):
+        self._refresh()
+        return list(self._rows)
+
+    def by_name(self, label_original):
+        self._refresh()
+        return self._by_name.get(label_original)
+
+    def by_idx(self, class_idx):
+        self._refresh()
+        return self._by_idx.get(int(class_idx))
+
+    def by_folder(self, folder_name):
+        self._refresh()
+        return self._by_folder.get(folder_name)
+
+    def max_idx(self):
+        self._refresh()
+        return max(self._by_idx, default=0)
+
+
+_LABELS = _LabelIndex()
+
+def list_labels():
+    return _LABELS.rows()
+
+def get_label(class_idx):
+    """Label row for class_idx, or None."""
+    return _LABELS.by_idx(class_idx)
+
+def find_label(label_original):
+    """Label row for label_original, or None."""
+    return _LABELS.by_name(label_original)
+
+def get_label_by_folder(folder_name):
+    return _LABELS.by_folder(folder_name)
+
+def _write_labels(rows):
+    write_csv(LABELS_CSV, rows, LABEL_FIELDS)
+    _LABELS.invalidate()
 
 # ---- Label management ----
 def register_label(label_original, notes="", dataset_version="v1"):
     """Register new label or return existing one. Returns (class_idx, folder_name)."""
-    rows = read_csv(LABELS_CSV)
-    for r in rows:
-        if r["label_original"] == label_original:
-            return int(r["class_idx"]), r["folder_name"]
+    existing = find_label(label_original)
+    if existing:
+        return int(existing["class_idx"]), existing["folder_name"]
+
+    with locked(LABELS_CSV):
+        # another process may have registered it (or taken next_idx) meanwhile
+        _LABELS.invalidate()
+        existing = find_label(label_original)
+        if existing:
+            return int(existing["class_idx"]), existing["folder_name"]
+        return _create_label(label_original, notes, dataset_version)
 
-    next_idx = max([int(r["class_idx"]) for r in rows], default=0) + 1
+def _create_label(label_original, notes, dataset_version):
+    rows = list_labels()
+    next_idx = _LABELS.max_idx() + 1
     slug = slugify(label_original, maxlen=20)
     folder_name = f"class_{next_idx:04d}_{slug}"
     created_at = now_str()
@@ -71,29 +264,23 @@ def register_label(label_original, notes="", dataset_version="v1"):
         "notes": notes,
     }
     rows.append(new_row)
-    fieldnames = ["class_idx","label_original","slug","folder_name","created_at","dataset_version","notes"]
-    write_csv(LABELS_CSV, rows, fieldnames)
+    _write_labels(rows)
 
     os.makedirs(os.path.join(FEATURE_ROOT, folder_name), exist_ok=True)
     return next_idx, folder_name
 
 # ---- Sample management ----
-def save_sample(sequence_array, class_idx, folder_name, metadata=None):
-    """
-    Save npz + json metadata in the correct folder.
-    Returns file path.
-    """
+def _write_sample_files(sequence_array, class_idx, folder_name, metadata):
+    """Write one npz + json sidecar. Returns (npz_path, samples.csv row)."""
     sample_uuid = uuid.uuid4().hex[:8]
     fname = f"sample_{class_idx:04d}_{sample_uuid}"
     npz_path = os.path.join(FEATURE_ROOT, folder_name, fname + ".npz")
     json_path = os.path.join(FEATURE_ROOT, folder_name, fname + ".json")
 
     # Save npz
-    import numpy as np
-    np.savez_compressed(npz_path, sequence=sequence_array.astype("float32"))
+    np.savez_compressed(npz_path, sequence=np.asarray(sequence_array, dtype=np.float32))
 
     # Save metadata
-    metadata = metadata or {}
     metadata.update({
         "class_idx": class_idx,
         "folder_name": folder_name,
@@ -103,14 +290,44 @@ def save_sample(sequence_array, class_idx, folder_name, metadata=None):
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
 
+    return npz_path, make_sample_record(fname + ".npz", class_idx, folder_name, metadata)
+
+def save_sample(sequence_array, class_idx, folder_name, metadata=None):
+    """
+    Save npz + json metadata in the correct folder.
+    Returns file path.
+    """
+    npz_path, record = _write_sample_files(sequence_array, class_idx, folder_name, metadata or {})
+
     # Record in samples.csv
-    add_sample_record(fname + ".npz", class_idx, folder_name, metadata)
+    add_sample_records([record])
 
     return npz_path
 
-def add_sample_record(filename, class_idx, folder_name, metadata):
-    rows = read_csv(SAMPLES_CSV)
-    new_row = {
+def save_samples_batch(seqs, class_idx, folder_name, metadata=None):
+    """
+    Save all variants of one recording together: the npz/json pairs are written
+    in parallel (zlib releases the GIL) and samples.csv gets a single commit.
+    Each variant's metadata is `metadata` plus aug_index/total_augs.
+    Returns list of file paths in the order of `seqs`.
+    """
+    seqs = list(seqs)
+    if not seqs:
+        return []
+    os.makedirs(os.path.join(FEATURE_ROOT, folder_name), exist_ok=True)
+    metas = [
+        {**(metadata or {}), "aug_index": i, "total_augs": len(seqs)}
+        for i in range(len(seqs))
+    ]
+    results = list(_io_pool().map(
+        lambda args: _write_sample_files(args[0], class_idx, folder_name, args[1]),
+        zip(seqs, metas),
+    ))
+    add_sample_records([record for _, record in results])
+    return [path for path, _ in results]
+
+def make_sample_record(filename, class_idx, folder_name, metadata):
+    return {
         "sample_id": uuid.uuid4().hex[:8],
         "class_idx": str(class_idx),
         "folder_name": folder_name,
@@ -123,26 +340,75 @@ def add_sample_record(filename, class_idx, folder_name, metadata):
         "dialect": metadata.get("dialect", ""),
         "created_at": metadata.get("created_at", now_str()),
     }
-    rows.append(new_row)
-    fieldnames = ["sample_id","class_idx","folder_name","file","user","session_id","frames","duration","source","dialect","created_at"]
-    write_csv(SAMPLES_CSV, rows, fieldnames)
+
+def add_sample_records(records):
+    """Commit a batch of sample rows to samples.csv in one append."""
+    if not records:
+        return
+    with locked(SAMPLES_CSV):
+        append_csv(SAMPLES_CSV, records, SAMPLE_FIELDS)
+
+def add_sample_record(filename, class_idx, folder_name, metadata):
+    add_sample_records([make_sample_record(filename, class_idx, folder_name, metadata)])
+
+def compact_samples():
+    """Rewrite samples.csv as a clean snapshot in the current column layout."""
+    with locked(SAMPLES_CSV):
+        write_csv(SAMPLES_CSV, read_csv(SAMPLES_CSV), SAMPLE_FIELDS)
+
+# ---- Raw video registry (upload dedup) ----
+def find_video(sha256, label, multi_sign=False):
+    """
+    Latest videos.csv row for this content hash + label processed in the same mode
+    (multi_sign), or None. Rows written before the multi_sign column count as single-sign.
+    """
+    mode = "1" if multi_sign else "0"
+    found = None
+    for r in read_csv(VIDEOS_CSV):
+        if r["sha256"] == sha256 and r["label"] == label and (r.get("multi_sign") or "0") == mode:
+            found = r
+    return found
+
+def add_video_record(sha256, label, file_path, size, job_id, user="", session_id="", multi_sign=False):
+    """Caller should hold locked(VIDEOS_CSV) across find_video + add_video_record."""
+    row = {
+        "sha256": sha256,
+        "label": label,
+        "file": file_path,
+        "size": str(size),
+        "job_id": job_id,
+        "user": user,
+        "session_id": session_id,
+        "multi_sign": "1" if multi_sign else "0",
+        "created_at": now_str(),
+    }
+    append_csv(VIDEOS_CSV, [row], VIDEO_FIELDS)
+    return row
 
 # ---- Label merge ----
 def merge_labels(src_class_idx, dst_class_idx):
     """
     Merge all samples from src into dst. Update samples.csv and move files.
+    Lock order is labels.csv then samples.csv (same as every other writer).
     """
-    label_rows = read_csv(LABELS_CSV)
+    with locked(LABELS_CSV), locked(SAMPLES_CSV):
+        _LABELS.invalidate()
+        return _merge_labels(src_class_idx, dst_class_idx)
+
+def _merge_labels(src_class_idx, dst_class_idx):
     samples = read_csv(SAMPLES_CSV)
 
     # Find folder names
-    src_label = next(r for r in label_rows if int(r["class_idx"]) == src_class_idx)
-    dst_label = next(r for r in label_rows if int(r["class_idx"]) == dst_class_idx)
+    src_label = get_label(src_class_idx)
+    dst_label = get_label(dst_class_idx)
+    if src_label is None or dst_label is None:
+        raise ValueError(f"Unknown class_idx {src_class_idx if src_label is None else dst_class_idx}")
     src_folder = os.path.join(FEATURE_ROOT, src_label["folder_name"])
     dst_folder = os.path.join(FEATURE_ROOT, dst_label["folder_name"])
 
     # Move files
     if os.path.exists(src_folder):
+        os.makedirs(dst_folder, exist_ok=True)
         for fname in os.listdir(src_folder):
             shutil.move(os.path.join(src_folder, fname), os.path.join(dst_folder, fname))
 
@@ -152,11 +418,11 @@ def merge_labels(src_class_idx, dst_class_idx):
             row["class_idx"] = str(dst_class_idx)
             row["folder_name"] = dst_label["folder_name"]
 
-    write_csv(SAMPLES_CSV, samples, samples[0].keys())
+    write_csv(SAMPLES_CSV, samples, SAMPLE_FIELDS)
 
     # Remove src label from labels.csv
-    label_rows = [r for r in label_rows if int(r["class_idx"]) != src_class_idx]
-    write_csv(LABELS_CSV, label_rows, label_rows[0].keys())
+    label_rows = [r for r in list_labels() if int(r["class_idx"]) != src_class_idx]
+    _write_labels(label_rows)
 
     # Cleanup
     if os.path.exists(src_folder):
@@ -6,6 +6,30 @@ import json
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
+def file_sha256(path, chunk_size=4 * 1024 * 1024):
+    """Hex sha256 of a file, read in chunks."""
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def parallel_map(fn, items, workers=None):
+    """
+    Ordered map over a thread pool; zlib inflation releases the GIL, so decoding
+    many .npz files scales with cores. workers: None -> settings.export_workers
+    (0 = one per CPU); 1 runs serially in the calling thread.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    items = list(items)
+    workers = settings.export_workers if workers is None else workers
+    workers = min(workers or os.cpu_count() or 1, max(1, len(items)))
+    if workers <= 1:
+        return [fn(x) for x in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="npz-decode") as pool:
+        return list(pool.map(fn, items))
+
 def save_json_to_storage(obj, path):
     import json
     ensure_dir(os.path.dirname(path))
@@ -19,70 +43,77 @@ def save_npz_feature(sequence_array, label_folder, filename, meta=None):
     return outpath
 
 
-def load_npz_features(base_dir: Path):
+def load_npz_features(base_dir: Path, expand: bool = True, workers: int = None):
     """Load all .npz feature files under base_dir.
 
     Returns a list of dicts: { 'sequence': ndarray(T,D), 'class_idx': int|None, 'path': Path, 'meta': dict }
+    expand: lazily augmented samples (sidecar has aug_recipe/aug_seed) are materialized
+    into one entry per variant, all with the same path.
+    workers: files are decoded concurrently (see parallel_map).
     """
     base = Path(base_dir)
-    files = list(base.rglob("*.npz"))
+    # sort by path for deterministic order (variants keep aug_index order)
+    files = sorted(base.rglob("*.npz"), key=str)
     samples = []
-    for p in files:
+    for loaded in parallel_map(lambda p: _load_npz_feature(p, expand), files, workers):
+        samples.extend(loaded)
+    return samples
+
+
+def _load_npz_feature(p: Path, expand: bool):
+    """Entries for one .npz (several for an expanded lazy sample, none if it has no sequence)."""
+    from app.processing.augmenter import expand_sample
+    try:
+        data = np.load(p, allow_pickle=False)
+    except Exception:
+        # allow fallback to pickle for meta if needed (sequence should still load)
+        data = np.load(p, allow_pickle=True)
+    seq = None
+    if 'sequence' in data:
+        seq = data['sequence']
+    elif 'sequences' in data:
+        seq = data['sequences']
+    else:
+        # skip files without sequence
+        return []
+
+    # prefer external json metadata if present
+    meta = {}
+    meta_path = p.with_suffix('.json')
+    if meta_path.exists():
         try:
-            data = np.load(p, allow_pickle=False)
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
         except Exception:
-            # allow fallback to pickle for meta if needed (sequence should still load)
-            data = np.load(p, allow_pickle=True)
-        seq = None
-        if 'sequence' in data:
-            seq = data['sequence']
-        elif 'sequences' in data:
-            seq = data['sequences']
-        else:
-            # skip files without sequence
-            continue
-
-        # prefer external json metadata if present
-        meta = {}
-        meta_path = p.with_suffix('.json')
-        if meta_path.exists():
-            try:
-                meta = json.loads(meta_path.read_text(encoding='utf-8'))
-            except Exception:
-                meta = {}
-        else:
-            # try to extract 'meta' inside npz if available
-            try:
-                if 'meta' in data:
-                    # meta may be stored as an array/object; attempt to coerce to dict
-                    raw = data['meta']
-                    # if it's an array-like object with item(), use that
+            meta = {}
+    else:
+        # try to extract 'meta' inside npz if available
+        try:
+            if 'meta' in data:
+                # meta may be stored as an array/object; attempt to coerce to dict
+                raw = data['meta']
+                # if it's an array-like object with item(), use that
+                try:
+                    meta = raw.item()
+                except Exception:
                     try:
-                        meta = raw.item()
+                        meta = dict(raw)
                     except Exception:
-                        try:
-                            meta = dict(raw)
-                        except Exception:
-                            meta = {}
-            except Exception:
-                meta = {}
-
-        class_idx = None
-        try:
-            class_idx = int(meta.get('class_idx')) if meta.get('class_idx') is not None else None
+                        meta = {}
         except Exception:
-            class_idx = None
+            meta = {}
 
-        samples.append({
-            'sequence': np.asarray(seq, dtype=np.float32),
-            'class_idx': class_idx,
-            'path': p,
-            'meta': meta,
-        })
+    class_idx = None
+    try:
+        class_idx = int(meta.get('class_idx')) if meta.get('class_idx') is not None else None
+    except Exception:
+        class_idx = None
 
-    # sort samples by path for deterministic order
-    samples.sort(key=lambda s: str(s['path']))
-    return samples
+    seq = np.asarray(seq, dtype=np.float32)
+    variants = expand_sample(seq, meta) if expand else [(seq, meta)]
+    return [
+        {'sequence': variant, 'class_idx': class_idx, 'path': p, 'meta': variant_meta}
+        for variant, variant_meta in variants
+    ]
 
 
 def merge_memmap(samples, output_dir: Path):
@@ -4,6 +4,8 @@ import json
 import logging
 from typing import Tuple, Dict, Any, List
 
+from app.processing.utils import parallel_map
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,13 +30,27 @@ def _read_npz(path: Path) -> Tuple[np.ndarray, Dict[str, Any]]:
     return seq, meta
 
 
-def validate_samples(base_dir: Path, expected_T: int = None, expected_D: int = None, fix: bool = False) -> Dict[str, Any]:
+def _inspect(p: Path) -> Dict[str, Any]:
+    try:
+        seq, meta = _read_npz(p)
+        if seq is None:
+            return {"file": str(p), "error": "no_sequence"}
+        if seq.ndim != 2:
+            return {"file": str(p), "shape": getattr(seq, 'shape', None), "error": "ndim!=2"}
+        return {"file": str(p), "shape": tuple(seq.shape), "class_idx": meta.get('class_idx')}
+    except Exception as e:
+        return {"file": str(p), "error": str(e)}
+
+
+def validate_samples(base_dir: Path, expected_T: int = None, expected_D: int = None, fix: bool = False,
+                     workers: int = None) -> Dict[str, Any]:
     """Validate .npz samples under base_dir.
 
     - Ensures each .npz has a sequence ndarray of shape (T, D)
     - Ensures corresponding .json exists and contains class_idx
     - If expected_T/expected_D unspecified, infer by majority shape
     - If fix=True, will attempt to pad/truncate sequences to target T when possible and update meta['frames']
+    - Files are decompressed concurrently on `workers` threads (utils.parallel_map)
 
     Returns report dict with keys: ok, target_shape, mismatch_count, mismatches(list)
     """
@@ -44,21 +60,11 @@ def validate_samples(base_dir: Path, expected_T: int = None, expected_D: int = N
         return {"ok": False, "reason": "no_samples", "details": "No .npz files found under base_dir"}
 
     shapes = {}
-    samples_info: List[Dict[str, Any]] = []
-    for p in npz_files:
-        try:
-            seq, meta = _read_npz(p)
-            if seq is None:
-                samples_info.append({"file": str(p), "error": "no_sequence"})
-                continue
-            if seq.ndim != 2:
-                samples_info.append({"file": str(p), "shape": getattr(seq, 'shape', None), "error": "ndim!=2"})
-                continue
-            shapes.setdefault(tuple(seq.shape), 0)
-            shapes[tuple(seq.shape)] += 1
-            samples_info.append({"file": str(p), "shape": tuple(seq.shape), "class_idx": meta.get('class_idx')})
-        except Exception as e:
-            samples_info.append({"file": str(p), "error": str(e)})
+    samples_info: List[Dict[str, Any]] = parallel_map(_inspect, npz_files, workers)
+    for info in samples_info:
+        if 'error' not in info:
+            shapes.setdefault(info['shape'], 0)
+            shapes[info['shape']] += 1
 
     # infer target shape
     if expected_T is None or expected_D is None:
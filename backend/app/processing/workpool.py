@@ -0,0 +1,43 @@
+"""
+Bounded worker pool for CPU/disk work triggered from async endpoints.
+- Runs blocking functions in a thread pool so the event loop stays free
+- Rejects new work once max_pending jobs are queued or running (backpressure)
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when a BoundedExecutor already has max_pending jobs in flight."""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int, max_pending: int, name: str = "worker"):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(self.max_workers, int(max_pending))
+        self._name = name
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self._name)
+        return self._pool
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool; raise PoolSaturated instead of queueing unboundedly."""
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated(f"{self._name} pool saturated ({self.max_pending} jobs pending)")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor(), functools.partial(fn, *args, **kwargs))
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
@@ -37,14 +37,12 @@ class SampleOut(BaseModel):
 @router.post("/labels", response_model=LabelOut)
 def create_label(label: str = Form(...), notes: str = Form(""), version: str = Form("v1")):
     class_idx, folder = su.register_label(label, notes=notes, dataset_version=version)
-    labels = su.read_csv(su.LABELS_CSV)
-    new_label = next(r for r in labels if int(r["class_idx"]) == class_idx)
-    return new_label
+    return su.get_label(class_idx)
 
 
 @router.get("/labels", response_model=List[LabelOut])
 def list_labels():
-    return su.read_csv(su.LABELS_CSV)
+    return su.list_labels()
 
 
 @router.post("/labels/merge")
@@ -87,8 +85,7 @@ def add_sample(
     file: UploadFile = File(...)
 ):
     # tìm folder theo class_idx
-    labels = su.read_csv(su.LABELS_CSV)
-    label = next((r for r in labels if int(r["class_idx"]) == class_idx), None)
+    label = su.get_label(class_idx)
     if not label:
         return {"status": "failed", "reason": "label not found"}
     folder = label["folder_name"]
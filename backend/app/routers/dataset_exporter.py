@@ -1,35 +1,81 @@
 from fastapi import APIRouter, HTTPException
 from pathlib import Path
-from ..processing.utils import load_npz_features, merge_memmap
-from ..processing import validator
+from ..processing import export, shards, validator
 from fastapi import Query
 
 router = APIRouter(prefix="/api/dataset", tags=["Dataset Exporter"])
 
 BASE_DATASET_DIR = Path("dataset/features")
 OUTPUT_DIR = Path("dataset/processed/memmap")
+SHARDS_DIR = Path("dataset/processed/shards")
+EXPECTED_T = 60
+EXPECTED_D = 126  # 2 hands * 21 landmarks * 3
 
 
 @router.post("/export")
-def export_dataset(fix: bool = Query(False, description="Attempt to auto-fix mismatched samples (pad/truncate) before export")):
-    """Aggregate all processed .npz files into unified memmap dataset"""
+def export_dataset(
+    fix: bool = Query(False, description="Attempt to auto-fix mismatched samples (pad/truncate) before export"),
+    incremental: bool = Query(False, description="Only append new/changed samples and tombstone deleted ones"),
+    sharded: bool = Query(False, description="Write fixed-size shards + shards.json index instead of one memmap"),
+    shard_size: int = Query(None, description="Rows per shard (default EXPORT_SHARD_SIZE)"),
+):
+    """
+    Aggregate all processed .npz files into unified memmap dataset (streamed, constant memory).
+    Both modes validate the same way first (header-only scan of every sample; 400 on
+    mismatches unless fix=true, 404 when there is nothing to export). incremental=true then
+    decodes only new/changed samples into the existing memmap; it cannot be combined with
+    sharded=true (shards are always rewritten in full).
+    """
+    if incremental and sharded:
+        raise HTTPException(status_code=400, detail="incremental export is only supported for the single memmap, not sharded=true")
     try:
-        # Validate samples first
-        report = validator.validate_samples(BASE_DATASET_DIR, expected_T=60, expected_D=226, fix=fix)
+        # Pass 1: headers + sidecars only
+        scan = export.scan_samples(BASE_DATASET_DIR, expected_T=EXPECTED_T, expected_D=EXPECTED_D)
+        report = export.scan_report(scan)
         if not report.get('ok'):
-            # If not ok and not fixed, return the report so caller can inspect
+            if not fix:
+                # return the report so caller can inspect
+                raise HTTPException(status_code=400, detail={"message": "Validation failed", "report": report})
+            report = validator.validate_samples(BASE_DATASET_DIR, expected_T=EXPECTED_T, expected_D=EXPECTED_D, fix=True)
             if report.get('fixed_count', 0) == 0:
                 raise HTTPException(status_code=400, detail={"message": "Validation failed", "report": report})
-        # Reload samples after validation/fix
-        samples = load_npz_features(BASE_DATASET_DIR)
-        if not samples:
+            scan = export.scan_samples(BASE_DATASET_DIR, expected_T=EXPECTED_T, expected_D=EXPECTED_D)
+        if not scan["entries"]:
             raise HTTPException(status_code=404, detail="No valid samples found.")
-        meta = merge_memmap(samples, OUTPUT_DIR)
+        if incremental:
+            # only the delta is decoded; the validation above already covered every file
+            meta = export.export_incremental(BASE_DATASET_DIR, OUTPUT_DIR, expected_T=EXPECTED_T, expected_D=EXPECTED_D)
+            meta.pop("report")
+            return {
+                "status": "success",
+                "message": f"Exported {meta['live_samples']} samples ({meta['mode']}).",
+                "validation_report": report,
+                "output": meta
+            }
+        # Pass 2: each sample decompressed straight into its memmap row
+        if sharded:
+            meta = shards.write_shards(scan, SHARDS_DIR, shard_size=shard_size)
+        else:
+            meta = export.write_memmap(scan, OUTPUT_DIR)
         return {
             "status": "success",
             "message": f"Exported {meta['total_samples']} samples.",
             "validation_report": report,
             "output": meta
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/export/compact")
+def compact_export():
+    """Drop tombstoned rows left by incremental exports"""
+    try:
+        meta = export.compact(OUTPUT_DIR)
+        return {"status": "success", "message": f"Removed {meta['removed_rows']} rows.", "output": meta}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
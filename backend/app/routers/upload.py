@@ -1,9 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, Form
-import shutil
+from fastapi import APIRouter, Form, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+import aiofiles
 import os
 import uuid
 
+from app.config import settings
 from app.processing import storage_utils as su
+from app.processing import landmarks
+from app.processing import resumable
+from app.processing.form_stream import FormStreamError, stream_form_file
+from app.processing.augmenter import get_recipe
+from app.processing.pipeline import TARGET_T, fit_length, save_augmented
+from app.processing.utils import file_sha256
+from app.processing.workpool import BoundedExecutor, PoolSaturated
 from app.tasks import enqueue_process_video
 from fastapi import Body
 import numpy as np
@@ -13,30 +22,205 @@ router = APIRouter(prefix="/upload", tags=["upload"])
 UPLOAD_DIR = "dataset/raw_videos"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+camera_pool = BoundedExecutor(settings.camera_workers, settings.camera_max_pending, name="camera-upload")
 
-@router.post("/video")
-async def upload_video(
-    file: UploadFile = File(...),
+
+@router.post(
+    "/video",
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["file", "label"],
+        "properties": {
+            "file": {"type": "string", "format": "binary"},
+            "user": {"type": "string"},
+            "label": {"type": "string"},
+            "dialect": {"type": "string"},
+            "session_id": {"type": "string"},
+            "multi_sign": {"type": "boolean"},
+        },
+    }}}}},
+)
+async def upload_video(request: Request):
+    """
+    Multipart form: file, label, user, dialect, session_id, multi_sign.
+    The body is parsed as it streams in (form_stream.stream_form_file): the video goes
+    straight into a .part file in UPLOAD_DIR, hashed (sha256) on the way, with no
+    intermediate spool file. Re-uploading identical content for the same label returns
+    the existing job instead of queueing MediaPipe again.
+    multi_sign=true splits a session recording into one sample group per detected sign.
+    """
+    tmp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+    try:
+        form = await stream_form_file(request.headers.get("content-type", ""), request.stream(), "file", tmp_path)
+        label = form.fields.get("label")
+        if not label:
+            raise HTTPException(status_code=422, detail="label is required")
+    except BaseException as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if isinstance(e, FormStreamError):
+            raise HTTPException(status_code=400, detail=str(e))
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail=f"malformed multipart body: {e}")
+        raise
+
+    user = form.fields.get("user", "")
+    dialect = form.fields.get("dialect", "")
+    session_id = form.fields.get("session_id") or uuid.uuid4().hex
+    multi_sign = form.fields.get("multi_sign", "").strip().lower() in ("1", "true", "yes", "on")
+    save_name = f"{user}_{label}_{uuid.uuid4().hex[:8]}_{os.path.basename(form.filename)}"
+    file_path = os.path.join(UPLOAD_DIR, save_name)
+
+    return await run_in_threadpool(
+        _register_and_enqueue, tmp_path, file_path, form.sha256, form.size, user, label, session_id, dialect, multi_sign
+    )
+
+
+def _job_failed(job_id: str) -> bool:
+    result = enqueue_process_video.AsyncResult(job_id)
+    if not result.ready():
+        return False
+    if result.failed():
+        return True
+    return isinstance(result.result, dict) and result.result.get("status") == "error"
+
+
+def _register_and_enqueue(tmp_path, file_path, sha256, size, user, label, session_id, dialect, multi_sign=False):
+    """
+    Register the label, then dedup on (sha256, label, multi_sign), otherwise move the upload into
+    place and queue it. Runs off the event loop (both steps take file locks).
+    """
+    su.register_label(label)
+    with su.locked(su.VIDEOS_CSV):
+        existing = su.find_video(sha256, label, multi_sign)
+        if existing and os.path.exists(existing["file"]) and not _job_failed(existing["job_id"]):
+            if os.path.abspath(tmp_path) != os.path.abspath(existing["file"]):
+                os.remove(tmp_path)
+            return {
+                "success": True,
+                "id": existing["job_id"],
+                "session_id": existing["session_id"],
+                "duplicate": True,
+                "message": "duplicate of an earlier upload",
+            }
+
+        os.replace(tmp_path, file_path)
+        # Gửi task tới Celery
+        job = enqueue_process_video.delay(
+            video_path=file_path, user=user, label=label, session_id=session_id, dialect=dialect,
+            multi_sign=multi_sign, sha256=sha256,
+        )
+        su.add_video_record(sha256, label, file_path, size, job.id, user=user, session_id=session_id, multi_sign=multi_sign)
+
+    # Normalize response to frontend UploadResult shape
+    return {"success": True, "id": job.id, "session_id": session_id, "message": "queued"}
+
+
+# ---- Resumable video upload: initiate -> PUT parts at offsets -> complete (DELETE aborts) ----
+@router.post("/video/resumable")
+def start_resumable_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
     user: str = Form(""),
     label: str = Form(...),
     dialect: str = Form(""),
     session_id: str = Form(None),
+    multi_sign: bool = Form(False),
 ):
+    """Reserve the target file in UPLOAD_DIR and return an upload_id for part uploads."""
+    if size <= 0 or size > settings.resumable_max_size:
+        raise HTTPException(status_code=400, detail=f"size must be between 1 and {settings.resumable_max_size} bytes")
     if not session_id:
         session_id = uuid.uuid4().hex
 
-    class_idx, folder = su.register_label(label)
+    resumable.sweep_stale(UPLOAD_DIR, settings.resumable_max_age)
+    su.register_label(label)
+    state = resumable.create_upload(
+        UPLOAD_DIR, filename, size,
+        {"user": user, "label": label, "dialect": dialect, "session_id": session_id, "multi_sign": multi_sign},
+    )
+    return {**resumable.status(state), "session_id": session_id}
 
-    save_name = f"{user}_{label}_{uuid.uuid4().hex[:8]}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, save_name)
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
 
-    # Gửi task tới Celery
-    job = enqueue_process_video.delay(video_path=file_path, user=user, label=label, session_id=session_id, dialect=dialect)
+def _load_resumable(upload_id: str) -> dict:
+    try:
+        return resumable.load_state(UPLOAD_DIR, upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown upload_id")
 
-    # Normalize response to frontend UploadResult shape
-    return {"success": True, "id": job.id, "session_id": session_id, "message": "queued"}
+
+@router.get("/video/resumable/{upload_id}")
+def resumable_upload_status(upload_id: str):
+    """Received/missing byte ranges; clients resume from next_offset."""
+    return resumable.status(_load_resumable(upload_id))
+
+
+@router.delete("/video/resumable/{upload_id}")
+def abort_resumable_upload(upload_id: str):
+    """Abandon an unfinished upload: its reserved file and state are removed (409 once completed)."""
+    try:
+        state = resumable.abort_upload(UPLOAD_DIR, upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown upload_id")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"upload_id": state["upload_id"], "aborted": True}
+
+
+@router.put("/video/resumable/{upload_id}")
+async def upload_video_part(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """
+    Write the raw request body into the target file at `offset`.
+    Bytes that arrived before a dropped connection are kept, so a retry only
+    needs to send what GET .../{upload_id} reports as missing.
+    """
+    state = _load_resumable(upload_id)
+    if state.get("result"):
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    size = state["size"]
+    if offset > size:
+        raise HTTPException(status_code=416, detail=f"offset beyond declared size {size}")
+
+    written = 0
+    overflow = False
+    try:
+        async with aiofiles.open(state["file_path"], "r+b") as out:
+            await out.seek(offset)
+            async for chunk in request.stream():
+                room = size - offset - written
+                if len(chunk) > room:
+                    chunk, overflow = chunk[:room], True
+                if chunk:
+                    await out.write(chunk)
+                    written += len(chunk)
+                if overflow:
+                    break
+    finally:
+        state = await run_in_threadpool(resumable.record_part, UPLOAD_DIR, upload_id, offset, offset + written)
+
+    if overflow:
+        raise HTTPException(status_code=413, detail="Part extends past the declared size")
+    return resumable.status(state)
+
+
+@router.post("/video/resumable/{upload_id}/complete")
+async def complete_resumable_upload(upload_id: str):
+    """Queue processing once every byte is present (same dedup as /upload/video)."""
+    state = _load_resumable(upload_id)
+    if state.get("result"):
+        return state["result"]
+    missing = resumable.missing_ranges(state)
+    if missing:
+        raise HTTPException(status_code=409, detail={"message": "Upload incomplete", "missing": missing})
+
+    file_path = state["file_path"]
+    sha256 = await run_in_threadpool(file_sha256, file_path)
+    result = await run_in_threadpool(
+        _register_and_enqueue, file_path, file_path, sha256, state["size"],
+        state["user"], state["label"], state["session_id"], state["dialect"], state.get("multi_sign", False),
+    )
+    await run_in_threadpool(resumable.set_result, UPLOAD_DIR, upload_id, result)
+    return result
 
 
 @router.post("/camera")
@@ -44,6 +228,7 @@ async def upload_camera(payload: dict = Body(...)):
     """
     Accept frames (array of arrays) and metadata, save as npz via storage_utils.save_sample
     Payload example: { user: str, label: str, session_id: str, dialect: str, frames: [{timestamp, landmarks}, ...] }
+    The CPU/disk work runs in a bounded thread pool; 503 when it is saturated.
     """
     user = payload.get("user", "")
     label = payload.get("label")
@@ -54,155 +239,100 @@ async def upload_camera(payload: dict = Body(...)):
     if not label or not frames:
         return {"success": False, "message": "Missing label or frames"}
 
+    try:
+        return await camera_pool.run(process_camera_upload, user, label, dialect, session_id, frames)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Camera upload queue is full, retry shortly",
+            headers={"Retry-After": str(settings.camera_retry_after)},
+        )
+
+
+def process_camera_upload(user: str, label: str, dialect: str, session_id: str, frames: list):
+    """
+    Synchronous part of /upload/camera (runs in camera_pool, off the event loop):
+    flatten landmarks, augment, save samples. Returns the response dict.
+    """
     # Ensure label exists
     class_idx, folder = su.register_label(label)
 
-    # Convert frames (list of {timestamp, landmarks}) into numpy array
-    # We expect landmarks arrays per frame; stack into (T, N) array
+    # Convert frames (list of {timestamp, landmarks}) into a (T, D) float32 array
     try:
-        # helper: convert a MediaPipe-like dict into a flat numeric vector (hands only)
-        def flatten_landmarks(ld):
-            # If already a list/array of numbers, return as-is
-            if ld is None:
-                return None
-            if isinstance(ld, (list, tuple, np.ndarray)):
-                return np.asarray(ld)
-
-            # If dict (MediaPipe style) with keys for hands only
-            if isinstance(ld, dict):
-                parts = []
-                # Only process hands (left_hand, right_hand) - no pose, no face
-                for key in ("left_hand", "right_hand"):
-                    elems = ld.get(key, [])
-                    # each elem is expected to be dict with x,y,z (no visibility for hands)
-                    for p in elems:
-                        if p is None:
-                            # missing point -> pad zeros (only x,y,z for hands)
-                            parts.extend([0.0, 0.0, 0.0])
-                            continue
-                        x = p.get("x") if isinstance(p, dict) else None
-                        y = p.get("y") if isinstance(p, dict) else None
-                        z = p.get("z") if isinstance(p, dict) else None
-                        # Only x,y,z for hands (no visibility)
-                        parts.extend([
-                            float(x) if x is not None else 0.0,
-                            float(y) if y is not None else 0.0,
-                            float(z) if z is not None else 0.0,
-                        ])
-                return np.array(parts, dtype="float32")
-
-            # Unknown format -> attempt to coerce
-            return np.asarray(ld)
-
-        landmarks_seq = []
-        for f in frames:
-            raw = f.get("landmarks")
-            flat = flatten_landmarks(raw)
-            if flat is None:
-                raise ValueError("frame missing landmarks")
-            landmarks_seq.append(flat)
-
-        # Ensure all frames have same vector length by padding shorter ones
-        maxlen = max([a.size for a in landmarks_seq])
-        # Build a numeric 2D array explicitly to avoid object-dtype pitfalls
-        T = len(landmarks_seq)
-        seq = np.zeros((T, maxlen), dtype="float32")
-        for i, a in enumerate(landmarks_seq):
-            if a.size > maxlen:
-                # truncate if unexpectedly longer
-                seq[i, :] = a[:maxlen].astype("float32")
-            else:
-                seq[i, : a.size] = a.astype("float32")
-
-        # Debug output
-        print(f"[DEBUG] First frame landmarks type: {type(frames[0].get('landmarks'))}")
-        print(f"[DEBUG] First frame landmarks shape/content: {frames[0].get('landmarks')}")
+        seq = landmarks.frames_to_array(frames)
         print(f"[DEBUG] Built numeric sequence shape: {seq.shape}, dtype: {seq.dtype}")
-        # Ensure sequence is numeric float32 (some inputs may produce object-dtype rows)
-        try:
-            seq = seq.astype("float32")
-        except Exception as e:
-            print(f"[WARN] seq.astype failed: {e}, attempting per-row conversion")
-            new = np.zeros((T, maxlen), dtype="float32")
-            for i in range(T):
-                row = landmarks_seq[i]
-                try:
-                    arr = np.asarray(row, dtype=np.float32).flatten()
-                except Exception:
-                    # best-effort flatten for nested dict/list structures
-                    vals = []
-                    def collect(x):
-                        if x is None:
-                            return
-                        if isinstance(x, (int, float)):
-                            vals.append(float(x))
-                        elif isinstance(x, dict):
-                            # prefer x,y,z,visibility order if available
-                            for k in ("x", "y", "z", "visibility"):
-                                if k in x:
-                                    try:
-                                        vals.append(float(x.get(k) or 0.0))
-                                    except Exception:
-                                        vals.append(0.0)
-                            # if dict has nested lists, collect them too
-                            for v in x.values():
-                                if isinstance(v, (list, tuple)):
-                                    for it in v:
-                                        collect(it)
-                        elif isinstance(x, (list, tuple, np.ndarray)):
-                            for it in x:
-                                collect(it)
-                        else:
-                            # ignore unknown types
-                            return
-                    collect(row)
-                    arr = np.asarray(vals, dtype=np.float32)
-
-                if arr.size > maxlen:
-                    new[i, :] = arr[:maxlen]
-                else:
-                    new[i, : arr.size] = arr
-            seq = new
     except Exception as e:
         print(f"[ERROR] Error processing landmarks: {e}")
         return {"success": False, "message": f"Invalid frames payload: {e}"}
 
-    # Apply augmentation to create multiple samples
-    from app.processing.augmenter import generate_augmented_sequences
-    
-    # Ensure sequence has proper shape (pad to 60 frames)
-    T, D = seq.shape
-    target_T = 60
-    if T < target_T:
-        pad = np.zeros((target_T - T, D))
-        seq_padded = np.vstack([seq, pad])
-    else:
-        seq_padded = seq[:target_T]
-    
-    # Generate augmented sequences
-    augmented_seq_list = generate_augmented_sequences(seq_padded)
-    
-    saved_paths = []
-    for i, aseq in enumerate(augmented_seq_list):
-        # Safety checks before saving
-        if not isinstance(aseq, np.ndarray) or aseq.dtype.kind not in ("f", "i") or aseq.ndim != 2:
-            print(f"[ERROR] Augmented sequence {i} not numeric 2D array: type={type(aseq)}, dtype={getattr(aseq, 'dtype', None)}, ndim={getattr(aseq, 'ndim', None)}")
-            continue
-            
-        metadata = {
-            "user": user, 
-            "session_id": session_id, 
-            "frames": target_T, 
-            "source": "camera", 
-            "dialect": dialect, 
-            "created_at": su.now_str(),
-            "augmented": True,
-            "aug_index": i,
-            "total_augs": len(augmented_seq_list)
-        }
-        
-        path = su.save_sample(aseq, class_idx, folder, metadata=metadata)
-        saved_paths.append(path)
-    
+    return save_camera_sequence(seq, class_idx, folder, user, dialect, session_id)
+
+
+@router.post("/camera/binary")
+async def upload_camera_binary(request: Request):
+    """
+    Packed alternative to /upload/camera (Content-Type: application/x-sign-frames).
+    Body: header + JSON meta {user, label, session_id, dialect} + float32/float16/int16
+    frame buffer, see processing.landmarks.decode_packed_frames. The body may be sent
+    with Content-Encoding gzip or zstd. Same augmentation/save path and response shape.
+    """
+    encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if encoding not in ("", "identity", "gzip", "x-gzip", "zstd"):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    # raw or compressed, nothing over the packed cap is buffered
+    too_large = HTTPException(status_code=413, detail=f"Body larger than {landmarks.MAX_PACKED_BYTES} bytes")
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > landmarks.MAX_PACKED_BYTES:
+            raise too_large
+        chunks.append(chunk)
+    body = b"".join(chunks)
+
+    try:
+        return await camera_pool.run(process_camera_packed, body, encoding)
+    except landmarks.PayloadTooLarge:
+        raise too_large
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Camera upload queue is full, retry shortly",
+            headers={"Retry-After": str(settings.camera_retry_after)},
+        )
+
+
+def process_camera_packed(body: bytes, content_encoding: str = ""):
+    """Synchronous part of /upload/camera/binary: decode packed frames, then save like /camera."""
+    try:
+        seq, meta = landmarks.decode_packed_frames(landmarks.decompress_body(body, content_encoding))
+    except landmarks.PayloadTooLarge:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Error decoding packed frames: {e}")
+        return {"success": False, "message": f"Invalid packed frames: {e}"}
+
+    label = meta.get("label")
+    if not label:
+        return {"success": False, "message": "Missing label or frames"}
+    session_id = meta.get("session_id") or uuid.uuid4().hex
+
+    class_idx, folder = su.register_label(label)
+    return save_camera_sequence(seq, class_idx, folder, meta.get("user", ""), meta.get("dialect", ""), session_id)
+
+
+def save_camera_sequence(seq: np.ndarray, class_idx: int, folder: str, user: str, dialect: str, session_id: str):
+    """Pad/truncate a (T, D) camera sequence, augment it and save the variants. Returns the response dict."""
+    metadata = {
+        "user": user,
+        "session_id": session_id,
+        "frames": TARGET_T,
+        "source": "camera",
+        "dialect": dialect,
+        "augmented": True,
+    }
+    saved_paths = save_augmented(fit_length(np.asarray(seq, dtype=np.float32)), class_idx, folder, metadata)
+    # lazy samples stand for every variant of their recipe; report the effective count either way
+    total_samples = len(saved_paths) * len(get_recipe()) if settings.augment_lazy else len(saved_paths)
+
     # Return multiple saved paths
-    return {"success": True, "id": session_id, "paths": saved_paths, "total_samples": len(saved_paths), "message": f"saved {len(saved_paths)} augmented samples"}
+    return {"success": True, "id": session_id, "paths": saved_paths, "total_samples": total_samples, "message": f"saved {total_samples} sample(s) in {len(saved_paths)} file(s)"}
@@ -1,13 +1,103 @@
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+from celery import chord
+
 from app.worker import celery_app
-from app.processing.pipeline import process_video_job
+from app.config import settings
+from app.processing.pipeline import process_video_job, save_video_sequence
+from app.processing import kp_cache, segments
+from app.processing.utils import file_sha256
+
+SEGMENT_TMP_DIR = os.path.join("dataset", "tmp", "segments")
+# per-job segment dirs older than this are assumed orphaned (worker killed mid-job)
+SEGMENT_TMP_MAX_AGE = 24 * 3600
+
+
+def sweep_stale_segments(max_age: float = SEGMENT_TMP_MAX_AGE) -> int:
+    """Remove per-job segment dirs not modified for max_age seconds. Returns dirs removed."""
+    if not os.path.isdir(SEGMENT_TMP_DIR):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(SEGMENT_TMP_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
 
 @celery_app.task(bind=True)
-def enqueue_process_video(self, video_path: str, user: str, label: str, session_id: str, dialect: str = ""):
+def enqueue_process_video(self, video_path: str, user: str, label: str, session_id: str, dialect: str = "",
+                          multi_sign: bool = False, sha256: str = None):
     # This wrapper calls processing.pipeline (synchronous heavy processing)
     # Use try/except to capture failure and push status
     try:
-        result = process_video_job(video_path, user, label, session_id, dialect)
+        if kp_cache.enabled():
+            sha256 = sha256 or file_sha256(video_path)
+            cached = kp_cache.get(kp_cache.cache_key(sha256, 6.0))
+            if cached is not None:
+                # keypoints already extracted for this content: no decode, no MediaPipe, no segments
+                result = save_video_sequence(cached, user, label, session_id, dialect, multi_sign=multi_sign)
+                return {"status": "done", "result": result}
+        plan = segments.plan_segments(video_path)
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+    if len(plan) > 1:
+        # long video: one subtask per segment, then stitch + save. replace() keeps
+        # this task's id, so /jobs/{id} reports the chord's final result.
+        # Segment files go to a per-job dir, removed by finalize_video_job or, if a
+        # segment fails (the body never runs), by the cleanup_segments errback.
+        sweep_stale_segments()
+        job_dir = os.path.join(SEGMENT_TMP_DIR, uuid.uuid4().hex)
+        header = [extract_video_segment.s(video_path, start, end, i, job_dir) for i, (start, end) in enumerate(plan)]
+        body = finalize_video_job.s(user, label, session_id, dialect, multi_sign, sha256, job_dir)
+        return self.replace(chord(header, body.on_error(cleanup_segments.si(job_dir))))
+
+    try:
+        result = process_video_job(video_path, user, label, session_id, dialect, multi_sign=multi_sign, sha256=sha256)
         return {"status": "done", "result": result}
     except Exception as e:
         # you can log here and rethrow or return failure
         return {"status": "error", "error": str(e)}
+
+@celery_app.task
+def extract_video_segment(video_path: str, start: int, end: int, index: int, job_dir: str = SEGMENT_TMP_DIR):
+    """Extract one segment's keypoints to a temp .npy in job_dir (arrays don't fit the JSON result backend)."""
+    seq = segments.extract_segment(video_path, start, end, target_fps=6.0, max_side=settings.ingest_max_side)
+    os.makedirs(job_dir, exist_ok=True)
+    out = os.path.join(job_dir, f"{uuid.uuid4().hex}_{index:03d}.npy")
+    np.save(out, seq.astype(np.float32))
+    return out
+
+@celery_app.task
+def cleanup_segments(job_dir: str):
+    """Chord errback: a segment task failed, so finalize_video_job won't run to remove job_dir."""
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+@celery_app.task
+def finalize_video_job(part_paths: list, user: str, label: str, session_id: str, dialect: str = "",
+                       multi_sign: bool = False, sha256: str = None, job_dir: str = None):
+    try:
+        seq = segments.stitch([np.load(p) for p in part_paths])
+        if sha256:
+            kp_cache.put(kp_cache.cache_key(sha256, 6.0), seq)
+        result = save_video_sequence(seq, user, label, session_id, dialect, multi_sign=multi_sign)
+        return {"status": "done", "result": result}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+    finally:
+        for p in part_paths:
+            if os.path.exists(p):
+                os.remove(p)
+        if job_dir:
+            shutil.rmtree(job_dir, ignore_errors=True)
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from app.config import settings
 
 # dùng Redis làm broker & backend từ environment variables
@@ -19,3 +20,16 @@ celery_app.conf.update(
 
 # Import tasks to register them with Celery
 from app import tasks
+
+
+@worker_process_init.connect
+def warm_hands_pool(**kwargs):
+    # each prefork child builds its MediaPipe graphs once, before taking jobs
+    from app.processing.keypoints_adapter import init_hands_pool
+    init_hands_pool()
+
+
+@worker_process_shutdown.connect
+def close_hands_pool(**kwargs):
+    from app.processing.keypoints_adapter import close_hands_pool
+    close_hands_pool()
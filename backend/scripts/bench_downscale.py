@@ -0,0 +1,55 @@
+"""Benchmark: MediaPipe Hands extraction at full resolution vs downscaled frames.
+
+Reports extraction time per clip and landmark drift against full resolution
+(normalized coords: mean/max abs difference over frames where both runs found
+the same hands, plus how often hand presence disagrees).
+
+Run from the backend folder:
+  python scripts/bench_downscale.py video.mp4 [more.mp4 ...] [--fps 6] [--sides 960 640 480]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.processing.ingest import sample_frames_from_video
+from app.processing.keypoints_adapter import extract_sequence_from_frames
+
+
+def run(video, fps, max_side):
+    frames = sample_frames_from_video(video, fps, max_side=max_side)
+    t0 = time.perf_counter()
+    seq = extract_sequence_from_frames(frames)
+    return time.perf_counter() - t0, seq, frames[0].shape if frames else None
+
+
+def hand_present(seq):
+    return np.stack([np.any(seq[:, :63] != 0, axis=1), np.any(seq[:, 63:] != 0, axis=1)], axis=1)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("videos", nargs="+")
+    ap.add_argument("--fps", type=float, default=6.0)
+    ap.add_argument("--sides", type=int, nargs="+", default=[960, 640, 480])
+    args = ap.parse_args()
+
+    for v in args.videos:
+        t_full, ref, shape = run(v, args.fps, 0)
+        ref_hands = hand_present(ref)
+        print(f"{os.path.basename(v)}: {len(ref)} frames, full res {shape}: {t_full * 1e3:.0f} ms")
+        for side in args.sides:
+            t, seq, shape = run(v, args.fps, side)
+            hands = hand_present(seq)
+            disagree = float(np.mean(hands != ref_hands)) if len(seq) else 0.0
+            both = np.repeat(hands & ref_hands, 63, axis=1)
+            diff = np.abs(seq - ref)[both]
+            drift = f"mean {diff.mean():.4f} max {diff.max():.4f}" if diff.size else "n/a (no common detections)"
+            print(f"  max_side {side:5d} {shape}: {t * 1e3:7.0f} ms (x{t_full / t:.2f}) drift {drift}, presence mismatch {disagree:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark: streaming memmap export time against decode worker count.
+
+Generates N synthetic compressed samples (unless --features points at a real
+dataset/features folder), then times export.write_memmap for each worker count.
+Also times validator.validate_samples, which decodes every file as well.
+
+Run from the backend folder:
+  python scripts/bench_export.py [--samples 5000] [--workers 1 2 4 8] [--features DIR]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.processing import export, validator
+
+
+def make_samples(root: Path, n: int, T=60, D=126):
+    rng = np.random.default_rng(0)
+    folder = root / "class_0001_bench"
+    folder.mkdir(parents=True)
+    for i in range(n):
+        # keypoint-like data: smooth in time, so it compresses like real samples
+        seq = np.cumsum(rng.normal(0, 0.01, (T, D)), axis=0).astype(np.float32) + 0.5
+        np.savez_compressed(folder / f"sample_0001_{i:06d}.npz", sequence=seq)
+        (folder / f"sample_0001_{i:06d}.json").write_text('{"class_idx": 1}', encoding="utf-8")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--samples", type=int, default=5000)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--features", help="existing features dir (skips generation)")
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_export_"))
+    try:
+        features = Path(args.features) if args.features else tmp / "features"
+        if not args.features:
+            make_samples(features, args.samples)
+        t0 = time.perf_counter()
+        scan = export.scan_samples(features)
+        t_scan = time.perf_counter() - t0
+        print(f"{len(scan['entries'])} files, {scan['total_rows']} rows {scan['target_shape']}, "
+              f"CPUs: {os.cpu_count()}, header scan {t_scan:.2f}s")
+
+        base = None
+        for w in args.workers:
+            t0 = time.perf_counter()
+            export.write_memmap(scan, tmp / "out", workers=w)
+            t = time.perf_counter() - t0
+            t1 = time.perf_counter()
+            validator.validate_samples(features, workers=w)
+            tv = time.perf_counter() - t1
+            base = base or t
+            print(f"  workers {w:2d}: export {t:6.2f}s (x{base / t:.2f})  validate {tv:6.2f}s")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
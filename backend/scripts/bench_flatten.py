@@ -0,0 +1,61 @@
+"""Micro-benchmark: camera payload -> (T, 126) array, per-frame loop vs vectorized decoder.
+
+Run from the backend folder:
+  python scripts/bench_flatten.py [--frames 60] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.processing import landmarks
+
+
+def make_frames(T, missing_rate=0.1):
+    frames = []
+    for t in range(T):
+        lm = {}
+        for key in landmarks.HAND_KEYS:
+            if random.random() < missing_rate:
+                lm[key] = []
+                continue
+            lm[key] = [{"x": random.random(), "y": random.random(), "z": random.random() * 0.1}
+                       for _ in range(landmarks.N_HAND)]
+        frames.append({"timestamp": t * 33, "landmarks": lm})
+    return frames
+
+
+def per_frame(frames):
+    # previous /upload/camera behaviour: flatten each frame, then copy rows one by one
+    return landmarks._stack_ragged([landmarks.flatten_landmarks(f["landmarks"]) for f in frames])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=60)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    random.seed(0)
+    full = make_frames(args.frames, missing_rate=0.0)
+    a, b = per_frame(full), landmarks.frames_to_array(full)
+    assert np.array_equal(a, b), "decoders disagree on a full payload"
+
+    for name, frames in (("both hands", full), ("10% hands missing", make_frames(args.frames))):
+        t_old = min(timeit.repeat(lambda: per_frame(frames), number=args.repeat, repeat=3)) / args.repeat
+        t_new = min(timeit.repeat(lambda: landmarks.frames_to_array(frames), number=args.repeat, repeat=3)) / args.repeat
+        print(f"{name:>18}: per-frame {t_old * 1e3:7.3f} ms | vectorized {t_new * 1e3:7.3f} ms | x{t_old / t_new:.1f}")
+
+    flat = [{"landmarks": np.random.rand(126).tolist()} for _ in range(args.frames)]
+    t_old = min(timeit.repeat(lambda: per_frame(flat), number=args.repeat, repeat=3)) / args.repeat
+    t_new = min(timeit.repeat(lambda: landmarks.frames_to_array(flat), number=args.repeat, repeat=3)) / args.repeat
+    print(f"{'flat lists':>18}: per-frame {t_old * 1e3:7.3f} ms | vectorized {t_new * 1e3:7.3f} ms | x{t_old / t_new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark: MediaPipe results -> (T, 126) conversion, per-hand lists vs preallocated buffer.
+
+Builds synthetic Hands results (protobuf landmark lists, like hands.process returns)
+so only the conversion is timed, not inference. Checks both paths give identical arrays.
+
+Run from the backend folder:
+  python scripts/bench_keypoints.py [--frames 600] [--repeat 5] [--hands 2]
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from mediapipe.framework.formats import classification_pb2, landmark_pb2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.processing.keypoints_adapter import (
+    D_HANDS, N_HAND, extract_keypoints_from_results, flatten_keypoints, write_keypoints,
+)
+
+
+def make_results(n_frames, n_hands, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for t in range(n_frames):
+        # every 5th frame has no detection, like a hand leaving the view
+        k = 0 if t % 5 == 4 else n_hands
+        lms, handed = [], []
+        for h, label in enumerate(("Left", "Right")[:k]):
+            lst = landmark_pb2.NormalizedLandmarkList()
+            for x, y, z in rng.random((N_HAND, 3)):
+                lst.landmark.add(x=x, y=y, z=z)
+            lms.append(lst)
+            cls = classification_pb2.ClassificationList()
+            cls.classification.add(label=label, score=0.9)
+            handed.append(cls)
+        results.append(SimpleNamespace(multi_hand_landmarks=lms or None, multi_handedness=handed or None))
+    return results
+
+
+def convert_lists(results):
+    return np.stack([flatten_keypoints(extract_keypoints_from_results(r)) for r in results], axis=0)
+
+
+def convert_buffer(results):
+    out = np.zeros((len(results), D_HANDS), dtype=np.float32)
+    flat = memoryview(out).cast("B").cast("f")
+    for t, r in enumerate(results):
+        write_keypoints(r, flat, t * D_HANDS)
+    return out
+
+
+def best_of(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=600)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--hands", type=int, default=2, choices=[1, 2])
+    args = ap.parse_args()
+
+    results = make_results(args.frames, args.hands)
+    a, b = convert_lists(results), convert_buffer(results)
+    assert a.shape == b.shape and np.array_equal(a, b), "conversion mismatch"
+
+    t_old = best_of(convert_lists, results, args.repeat)
+    t_new = best_of(convert_buffer, results, args.repeat)
+    print(f"{args.frames} frames, {args.hands} hand(s), best of {args.repeat}")
+    print(f"  lists + np.array + concatenate: {t_old / args.frames * 1e6:7.2f} us/frame")
+    print(f"  preallocated buffer:            {t_new / args.frames * 1e6:7.2f} us/frame (x{t_old / t_new:.2f})")
+
+
+if __name__ == "__main__":
+    main()
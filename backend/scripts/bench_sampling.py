@@ -0,0 +1,77 @@
+"""Benchmark: decode time per clip, old stride sampler vs grab()/retrieve() timestamp sampler.
+
+Run from the backend folder:
+  python scripts/bench_sampling.py [video.mp4 ...] [--fps 6]
+Without videos a synthetic 10 s 1280x720 @ 29.97 fps clip is generated in /tmp.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.processing.ingest import sample_frames_from_video
+
+
+def stride_sampler(video_path, target_fps):
+    # previous implementation: read() every frame, keep every int(fps/target)-th
+    cap = cv2.VideoCapture(video_path)
+    video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    sample_rate = max(1, int(video_fps / target_fps))
+    frames = []
+    idx = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if idx % sample_rate == 0:
+            frames.append(frame)
+        idx += 1
+    cap.release()
+    return frames
+
+
+def synthetic_clip(path, fps=29.97, seconds=10, size=(1280, 720)):
+    w = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    for i in range(int(fps * seconds)):
+        w.write(np.roll(base, i * 4, axis=1))
+    w.release()
+    return path
+
+
+def timed(fn, *args, repeat=3):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("videos", nargs="*")
+    ap.add_argument("--fps", type=float, default=6.0)
+    args = ap.parse_args()
+    videos = args.videos or [synthetic_clip("/tmp/bench_sampling_clip.mp4")]
+
+    for v in videos:
+        cap = cv2.VideoCapture(v)
+        fps, n = cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        t_old, old = timed(stride_sampler, v, args.fps)
+        t_new, new = timed(sample_frames_from_video, v, args.fps)
+        dur = n / fps if fps else 0
+        print(f"{os.path.basename(v)}: {n} frames @ {fps:.2f} fps -> target {args.fps} fps")
+        print(f"  stride  : {t_old * 1e3:8.1f} ms  {len(old):4d} frames  ({len(old) / dur if dur else 0:.2f} fps effective)")
+        print(f"  grab/ts : {t_new * 1e3:8.1f} ms  {len(new):4d} frames  ({len(new) / dur if dur else 0:.2f} fps effective)")
+
+
+if __name__ == "__main__":
+    main()
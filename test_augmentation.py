@@ -58,6 +58,9 @@ def test_camera_upload_augmentation():
             print(f"   Total samples created: {total_samples}")
             print(f"   Number of paths: {len(paths) if paths else 0}")
             
+            # AUGMENT_LAZY=1 saves one file per recording; total_samples still counts the variants
+            if paths and len(paths) < total_samples:
+                print("ℹ️  Lazy augmentation - variants are materialized on export")
             if total_samples > 1:
                 print("✅ Augmentation is working - multiple samples created!")
             else:
@@ -1,9 +1,21 @@
 import sys, os
-sys.path.insert(0, os.path.abspath('.'))
-from backend.app.processing.augmenter import time_warp
+sys.path.insert(0, os.path.abspath('backend'))
+from app.processing.augmenter import time_warp
 import numpy as np
 
 for f in [1.2, 0.8, 1.0]:
     x = np.random.rand(60,226).astype(np.float32)
     y = time_warp(x, factor=f)
     print('factor', f, '->', y.shape)
+
+# a variant combining scale, jitter and warp must show all three effects
+from app.processing.augmenter import augment_batch
+x = np.cumsum(np.random.rand(60, 126), axis=0).astype(np.float32)
+warped = time_warp(x, factor=1.2)
+out = augment_batch(x, seed=0, variants=(("combo", 2.0, 0.5, 1.2),))[0]
+resid = out - 2.0 * warped
+assert not np.allclose(out, x), "combo variant returned the input"
+assert abs(resid.std() - 0.5) < 0.05, f"jitter missing/wrong: std {resid.std():.3f}"
+assert abs(resid.mean()) < 0.05, "scale missing: residual has an offset"
+assert (out - 2.0 * x).std() > 2 * resid.std(), "warp missing: output matches the unwarped input"
+print('combo variant: scale, jitter and warp all applied')
@@ -34,17 +34,17 @@ def time_warp_resample(seq, factor=None, low=0.8, high=1.2):
     if factor == 1.0:
         return seq
     new_T = max(1, int(round(T * factor)))
-    t_orig = np.arange(T)
-    t_warp = np.linspace(0, T - 1, new_T)
-    warped = np.zeros((new_T, D), dtype=np.float32)
-    for d in range(D):
-        warped[:, d] = np.interp(t_warp, t_orig, seq[:, d])
-    t_resample = np.linspace(0, new_T - 1, T)
-    resampled = np.zeros((T, D), dtype=np.float32)
-    t_warp_indices = np.arange(new_T)
-    for d in range(D):
-        resampled[:, d] = np.interp(t_resample, t_warp_indices, warped[:, d])
-    return resampled
+    warped = _interp_rows(seq, np.linspace(0, T - 1, new_T))
+    return _interp_rows(warped, np.linspace(0, new_T - 1, T))
+
+
+def _interp_rows(seq, positions):
+    """Linear interpolation of (T, D) at fractional row positions, all columns at once."""
+    T = seq.shape[0]
+    i0 = np.clip(np.floor(positions).astype(np.intp), 0, T - 1)
+    i1 = np.minimum(i0 + 1, T - 1)
+    w = (positions - i0).astype(np.float32)[:, None]
+    return (seq[i0] + (seq[i1] - seq[i0]) * w).astype(np.float32)
 
 
 def mirror_sequence(seq):
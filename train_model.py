@@ -1,6 +1,7 @@
 """
 Simple training script for sign language recognition
-Dataset format: memmap X (N, 60, 226), y (N,)
+Dataset format (POST /api/dataset/export): memmap X features.dat (N, 60, 126),
+y labels.int32 (N,), valid.dat row mask; see backend/app/processing/export.py
 """
 import numpy as np
 import tensorflow as tf
@@ -19,27 +20,34 @@ BATCH_SIZE = 8
 VALIDATION_SPLIT = 0.2
 
 def load_dataset():
-    """Load memmap dataset"""
+    """Load memmap dataset (features.dat + columnar side arrays written by the exporter)"""
     print("Loading dataset...")
     
     # Load metadata
-    meta_path = os.path.join(DATASET_PATH, "dataset_meta.json")
+    meta_path = os.path.join(DATASET_PATH, "meta.json")
     with open(meta_path, 'r') as f:
         meta = json.load(f)
+    N, T, D = meta['shape']
+    meta['sequence_length'], meta['feature_dim'] = T, D
     
-    print(f"Dataset info: {meta['total_samples']} samples, shape ({meta['sequence_length']}, {meta['feature_dim']})")
+    print(f"Dataset info: {N} rows, shape ({T}, {D})")
     
     # Load memmap arrays
-    X_path = os.path.join(DATASET_PATH, "dataset_X.dat")
-    y_path = os.path.join(DATASET_PATH, "dataset_y.dat")
+    X = np.memmap(os.path.join(DATASET_PATH, "features.dat"), dtype=np.float32, mode='r', shape=(N, T, D))
+    y = np.memmap(os.path.join(DATASET_PATH, "labels.int32"), dtype='<i4', mode='r', shape=(N,))
     
-    X = np.memmap(X_path, dtype=np.float32, mode='r', 
-                  shape=(meta['total_samples'], meta['sequence_length'], meta['feature_dim']))
-    y = np.memmap(y_path, dtype=np.int32, mode='r', shape=(meta['total_samples'],))
+    # Drop tombstoned rows (incremental exports) and samples without a class
+    keep = np.asarray(y) >= 0
+    valid_path = os.path.join(DATASET_PATH, "valid.dat")
+    if os.path.exists(valid_path):
+        keep &= np.fromfile(valid_path, dtype=np.uint8)[:N] == 1
     
     # Convert to regular arrays for easier manipulation
-    X = np.array(X)
-    y = np.array(y)
+    X = np.array(X[keep])
+    # class_idx values -> contiguous 0..C-1 for sparse_categorical_crossentropy
+    classes, y = np.unique(np.asarray(y)[keep], return_inverse=True)
+    y = y.astype(np.int32)
+    meta['class_idx_map'] = classes.tolist()
     
     print(f"Loaded X: {X.shape}, y: {y.shape}")
     print(f"Class distribution: {np.bincount(y)}")